@@ -32,7 +32,7 @@ class ProblemAdmin(admin.ModelAdmin):
         'title', 'difficulty', 'category', 'test_case_count', 
         'is_active', 'created_by', 'created_at'
     ]
-    list_filter = ['difficulty', 'category', 'is_active', 'created_at', 'tags']
+    list_filter = ['difficulty', 'category', 'judging_policy', 'checker_mode', 'is_active', 'created_at', 'tags']
     search_fields = ['title', 'description', 'category']
     filter_horizontal = ['tags']
     prepopulated_fields = {'slug': ('title',)}
@@ -43,7 +43,13 @@ class ProblemAdmin(admin.ModelAdmin):
             'fields': ('title', 'slug', 'description', 'difficulty', 'category', 'tags')
         }),
         ('Limits & Constraints', {
-            'fields': ('time_limit', 'memory_limit', 'constraints')
+            'fields': ('time_limit', 'memory_limit', 'judging_policy', 'constraints')
+        }),
+        ('Output Checking', {
+            'fields': (
+                'checker_mode', 'float_abs_tolerance', 'float_rel_tolerance',
+                'checker_language', 'checker_code'
+            )
         }),
         ('Sample Data', {
             'fields': ('sample_input', 'sample_output', 'explanation', 'hints')
@@ -28,6 +28,33 @@ class Problem(models.Model):
     sample_output = models.TextField()
     explanation = models.TextField()
     hints = models.TextField(blank=True)
+    JUDGING_POLICY_CHOICES = [
+        ('ALL', 'Run all test cases (partial scoring)'),
+        ('FAIL_FAST', 'Stop at first failure'),
+        ('SAMPLES_FIRST', 'Samples first, then hidden'),
+    ]
+
+    judging_policy = models.CharField(max_length=20, choices=JUDGING_POLICY_CHOICES, default='ALL')
+    CHECKER_MODE_CHOICES = [
+        ('TOKEN', 'Tokens, numbers compared by value'),
+        ('EXACT', 'Exact match'),
+        ('WHITESPACE', 'Whitespace-insensitive'),
+        ('FLOAT', 'Numbers within tolerance'),
+        ('CASE_INSENSITIVE', 'Case-insensitive'),
+        ('CUSTOM', 'Checker program'),
+    ]
+    CHECKER_LANGUAGE_CHOICES = [
+        ('python', 'Python'),
+        ('cpp', 'C++'),
+    ]
+
+    checker_mode = models.CharField(max_length=20, choices=CHECKER_MODE_CHOICES, default='TOKEN')
+    # FLOAT mode: a number passes if it is within either tolerance of the expected one
+    float_abs_tolerance = models.FloatField(default=1e-6)
+    float_rel_tolerance = models.FloatField(default=1e-6)
+    # CUSTOM mode: see apps/submissions/special_judge.py for the checker protocol
+    checker_code = models.TextField(blank=True)
+    checker_language = models.CharField(max_length=10, choices=CHECKER_LANGUAGE_CHOICES, default='python')
     tags = models.ManyToManyField(Tag, related_name='problems')
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
@@ -42,4 +69,18 @@ class TestCase(models.Model):
     is_hidden = models.BooleanField(default=False)
     points = models.IntegerField(default=10)
     order = models.IntegerField(default=0)
+    # sha256 keys of the bodies in the content-addressed test data store, which
+    # is what the judge reads; the text fields above are the editable source
+    input_hash = models.CharField(max_length=64, blank=True, editable=False)
+    output_hash = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        from apps.submissions.test_data import store_test_case
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'input_data', 'expected_output'} & set(update_fields):
+            store_test_case(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'input_hash', 'output_hash'}
+        super().save(*args, **kwargs)
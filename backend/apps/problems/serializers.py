@@ -75,7 +75,9 @@ class ProblemCreateSerializer(serializers.ModelSerializer):
         model = Problem
         fields = [
             'title', 'description', 'difficulty', 'category',
-            'time_limit', 'memory_limit', 'constraints',
+            'time_limit', 'memory_limit', 'judging_policy', 'constraints',
+            'checker_mode', 'float_abs_tolerance', 'float_rel_tolerance',
+            'checker_language', 'checker_code',
             'sample_input', 'sample_output', 'explanation', 'hints', 'tags'
         ]
     
@@ -1,11 +1,21 @@
 from django.contrib import admin
-from .models import Submission, TestCaseResult, Language
+from .models import Submission, TestCaseResult, Language, Rejudge
+from . import rejudge
 
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'problem', 'language', 'status', 'score', 'submitted_at')
     list_filter = ('status', 'language', 'submitted_at')
     search_fields = ('user__username', 'problem__title')
+    actions = ['rejudge_submissions']
+
+    @admin.action(description='Rejudge selected submissions')
+    def rejudge_submissions(self, request, queryset):
+        job = rejudge.start_rejudge(
+            created_by=request.user,
+            submission_ids=list(queryset.values_list('id', flat=True))
+        )
+        self.message_user(request, f"Rejudge {job.id} started for {job.total} submissions")
 
 @admin.register(TestCaseResult)
 class TestCaseResultAdmin(admin.ModelAdmin):
@@ -15,6 +25,50 @@ class TestCaseResultAdmin(admin.ModelAdmin):
 
 @admin.register(Language)
 class LanguageAdmin(admin.ModelAdmin):
-    list_display = ('name', 'version', 'is_active')
+    list_display = ('name', 'version', 'image', 'cache_artifacts', 'is_active')
     list_filter = ('is_active',)
-    search_fields = ('name',)
\ No newline at end of file
+    search_fields = ('name',)
+
+@admin.register(Rejudge)
+class RejudgeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'problem', 'language', 'status', 'progress', 'created_by', 'created_at', 'heartbeat_at')
+    list_filter = ('status',)
+    fields = (
+        'problem', 'language', 'statuses', 'submitted_after', 'submitted_before', 'submission_ids',
+        'status', 'total', 'queued', 'cursor', 'created_by', 'heartbeat_at', 'finished_at',
+    )
+    actions = ['pause_rejudges', 'resume_rejudges', 'cancel_rejudges']
+
+    def get_readonly_fields(self, request, obj=None):
+        state = ('status', 'total', 'queued', 'cursor', 'created_by', 'heartbeat_at', 'finished_at')
+        if obj is None:
+            return state
+        # The selection of a started rejudge is fixed; start a new one instead
+        return self.fields
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return
+        obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        rejudge.launch(obj)
+
+    @admin.display(description='Progress')
+    def progress(self, obj):
+        counts = rejudge.progress(obj)
+        return f"{counts['judged']} judged, {counts['in_flight']} judging, of {counts['total']}"
+
+    @admin.action(description='Pause selected rejudges')
+    def pause_rejudges(self, request, queryset):
+        for job in queryset:
+            rejudge.pause(job)
+
+    @admin.action(description='Resume selected rejudges')
+    def resume_rejudges(self, request, queryset):
+        for job in queryset:
+            rejudge.resume(job)
+
+    @admin.action(description='Cancel selected rejudges')
+    def cancel_rejudges(self, request, queryset):
+        for job in queryset:
+            rejudge.cancel(job)
@@ -1,7 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 class SubmissionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.submissions'
     verbose_name = 'Submissions'
-    
+
+    def ready(self):
+        # Judge workers reload their language runtimes when a Language changes
+        from .languages import language_changed
+        from .models import Language
+        post_save.connect(language_changed, sender=Language, dispatch_uid='language-registry-save')
+        post_delete.connect(language_changed, sender=Language, dispatch_uid='language-registry-delete')
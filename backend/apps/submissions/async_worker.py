@@ -0,0 +1,359 @@
+"""
+asyncio judge worker.
+
+A Celery prefork process blocks for the whole life of a submission, so a
+node judges as many submissions at once as it has worker processes. This
+worker takes submissions from the fair queue, in its deficit round-robin
+order, and judges many of them concurrently in one process: every sandbox session is an asyncio
+subprocess whose output is spooled as it arrives, so the event loop only
+waits on pipes.
+
+Concurrency is bounded by a JudgeBudget, not by the number of
+submissions in flight. Each sandbox session holds one core of
+JUDGE_CPU_BUDGET, pinned like the Celery path does, and its share of
+JUDGE_MEMORY_BUDGET_MB. Database work runs in Django's sync thread, and
+finished submissions are written back in batches, several per
+transaction.
+
+The worker owns the node's CPU budget, so it should not share a node with
+Celery workers that judge. Run it with JUDGE_WORKER=async, so submissions
+are left for it instead of being queued to Celery.
+"""
+import asyncio
+import logging
+import signal
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utils.exceptions import CodeExecutionError
+
+from . import fair_queue
+from .metrics import add_timing
+from .models import Submission
+from .services import CodeExecutionService
+
+logger = logging.getLogger(__name__)
+
+
+class JudgeBudget:
+    """CPU and memory budget shared by every sandbox session of the worker."""
+    def __init__(self, cpus, memory_mb):
+        self.memory_mb = memory_mb
+        self._free_memory_mb = memory_mb
+        self._memory = asyncio.Condition()
+        # A queue of core ids is a semaphore that also says which core is held
+        self._cpus = asyncio.Queue()
+        for cpu in cpus:
+            self._cpus.put_nowait(cpu)
+
+    @asynccontextmanager
+    async def slot(self, memory_mb):
+        """Hold one CPU and `memory_mb` of memory, yielding the CPU id."""
+        # A sandbox larger than the whole budget still runs, just on its own
+        memory_mb = min(memory_mb, self.memory_mb)
+        async with self._memory:
+            await self._memory.wait_for(lambda: self._free_memory_mb >= memory_mb)
+            self._free_memory_mb -= memory_mb
+        try:
+            cpu = await self._cpus.get()
+            try:
+                yield cpu
+            finally:
+                self._cpus.put_nowait(cpu)
+        finally:
+            async with self._memory:
+                self._free_memory_mb += memory_mb
+                self._memory.notify_all()
+
+
+class ResultWriter:
+    """Write finished submissions back in batches of up to `batch_size`."""
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue()
+
+    def put(self, submission_id, write):
+        """
+        Queue `write`, a function that stores the verdict of submission
+        `submission_id`. The submission's fair queue slot is released once
+        the write is done.
+        """
+        self._queue.put_nowait((submission_id, write))
+
+    def close(self):
+        self._queue.put_nowait(None)
+
+    async def run(self):
+        closed = False
+        while not closed:
+            write = await self._queue.get()
+            if write is None:
+                break
+
+            batch = [write]
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    write = await asyncio.wait_for(self._queue.get(), max(0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                if write is None:
+                    closed = True
+                    break
+                batch.append(write)
+
+            await sync_to_async(self._write)(batch)
+
+    @staticmethod
+    def _write(batch):
+        try:
+            with transaction.atomic():
+                for submission_id, write in batch:
+                    # One failed write must not roll back the rest of the batch
+                    try:
+                        with transaction.atomic():
+                            write()
+                    except Exception:
+                        logger.exception(f"Failed to store judged submission {submission_id}")
+                        mark_judge_error(submission_id)
+        finally:
+            # Only now is the verdict visible, so the user's next submission may start
+            for submission_id, _ in batch:
+                fair_queue.release(submission_id)
+        logger.info(f"Stored {len(batch)} judged submissions")
+
+
+def mark_judge_error(submission_id):
+    """
+    Fail a claimed submission that could not be judged or stored. Claimed
+    submissions are never retried, so they must not stay RUNNING.
+    """
+    try:
+        Submission.objects.filter(id=submission_id, status='RUNNING').update(
+            status='JUDGE_ERROR', score=0, error_message='Internal judge error'
+        )
+    except Exception:
+        logger.exception(f"Failed to mark submission {submission_id} as a judge error")
+
+
+def claim_pending(limit):
+    """
+    Mark up to `limit` PENDING submissions as RUNNING, returning their ids.
+
+    They are taken from the fair queue, each holding a judge slot until it
+    is judged. Without the fair queue (development) the oldest are claimed
+    instead, live ones before bulk rejudges. So are live submissions that
+    have waited longer than a slot may be held, in case the fair queue lost
+    them while Redis was down.
+    """
+    try:
+        taken = fair_queue.take(limit)
+    except Exception as e:
+        logger.warning(f"Fair queue unavailable, claiming the oldest submissions: {e}")
+        taken = None
+    if taken is None:
+        return _claim_oldest(limit)
+
+    with transaction.atomic():
+        ids = list(
+            Submission.objects.select_for_update(skip_locked=True)
+            .filter(id__in=taken, status='PENDING')
+            .values_list('id', flat=True)
+        )
+        Submission.objects.filter(id__in=ids).update(status='RUNNING')
+    for submission_id in set(taken) - set(ids):
+        # Already judged after being swept up below, or deleted
+        fair_queue.release(submission_id)
+
+    if len(ids) < limit:
+        stale = timezone.now() - timedelta(seconds=settings.JUDGE_FAIR_SLOT_TIMEOUT)
+        ids += _claim_oldest(limit - len(ids), submitted_before=stale)
+    return ids
+
+
+def _claim_oldest(limit, submitted_before=None):
+    with transaction.atomic():
+        pending = Submission.objects.select_for_update(skip_locked=True).filter(status='PENDING')
+        if submitted_before is not None:
+            # Rejudged submissions are old by nature and would all look lost
+            pending = pending.filter(submitted_at__lt=submitted_before, rejudge__isnull=True)
+        ids = list(
+            pending.order_by(F('rejudge').asc(nulls_first=True), 'submitted_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        Submission.objects.filter(id__in=ids).update(status='RUNNING')
+    return ids
+
+
+class AsyncJudgeWorker:
+    def __init__(self, max_submissions=None, poll_interval=None):
+        self.max_submissions = max_submissions or settings.JUDGE_ASYNC_MAX_SUBMISSIONS
+        self.poll_interval = poll_interval or settings.JUDGE_ASYNC_POLL_INTERVAL
+        self.budget = None
+        self.writer = None
+
+    async def run(self):
+        """Claim and judge submissions until SIGINT or SIGTERM, then drain."""
+        self.budget = JudgeBudget(range(settings.JUDGE_CPU_BUDGET), settings.JUDGE_MEMORY_BUDGET_MB)
+        self.writer = ResultWriter(settings.JUDGE_ASYNC_RESULT_BATCH, settings.JUDGE_ASYNC_FLUSH_INTERVAL)
+        writer_task = asyncio.create_task(self.writer.run())
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        stopping = asyncio.create_task(stop.wait())
+
+        running = set()
+        while not stop.is_set():
+            free = self.max_submissions - len(running)
+            if free > 0:
+                try:
+                    claimed = await sync_to_async(claim_pending)(free)
+                except Exception:
+                    logger.exception("Failed to claim pending submissions")
+                    claimed = []
+                for submission_id in claimed:
+                    task = asyncio.create_task(self.judge(submission_id))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+
+            # Wake up for a finished submission, a stop request or the next poll
+            await asyncio.wait(
+                [stopping, *running],
+                timeout=self.poll_interval,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+        logger.info(f"Stopping, waiting for {len(running)} submissions in flight")
+        if running:
+            await asyncio.gather(*running)
+        self.writer.close()
+        await writer_task
+
+    @staticmethod
+    def _load(submission_id, timings):
+        submission = Submission.objects.select_related('problem', 'language').get(id=submission_id)
+        test_cases, runtime, memo_key = CodeExecutionService._start(submission, timings)
+        return submission, test_cases, runtime, memo_key
+
+    async def judge(self, submission_id):
+        queued = False
+        try:
+            queued = await self._judge(submission_id)
+        finally:
+            # A queued result releases the slot once the writer has stored it
+            if not queued:
+                await asyncio.to_thread(fair_queue.release, submission_id)
+
+    async def _judge(self, submission_id):
+        """Judge a claimed submission. Returns True if its result was queued for the writer."""
+        timings = {}
+        try:
+            submission, test_cases, runtime, memo_key = await sync_to_async(self._load)(submission_id, timings)
+        except Submission.DoesNotExist:
+            return False
+        except Exception:
+            logger.exception(f"Failed to load submission {submission_id}")
+            await sync_to_async(mark_judge_error)(submission_id)
+            return False
+
+        executor = None
+        try:
+            executor = CodeExecutionService._make_executor(submission, runtime)
+            results = await self._judge_test_cases(
+                executor, test_cases, submission.problem,
+                CodeExecutionService._time_limit_sec(submission, runtime),
+                timings
+            )
+        except CodeExecutionError as e:
+            self.writer.put(submission_id, partial(CodeExecutionService._judge_error, submission, e, timings))
+            return True
+        except Exception as e:
+            # Claimed submissions are never retried, so they must not stay RUNNING
+            logger.exception(f"Judging submission {submission_id} crashed")
+            error = CodeExecutionError("Internal judge error", error_type="JUDGE_ERROR", details=str(e))
+            self.writer.put(submission_id, partial(CodeExecutionService._judge_error, submission, error, timings))
+            return True
+        finally:
+            if executor is not None:
+                await asyncio.to_thread(executor.cleanup)
+
+        self.writer.put(
+            submission_id, partial(CodeExecutionService._finish, submission, test_cases, results, memo_key, timings)
+        )
+        return True
+
+    async def _judge_test_cases(self, executor, test_cases, problem, time_limit_sec, timings):
+        """CodeExecutionService._judge_test_cases() with sandbox sessions on the event loop."""
+        groups, fail_fast = CodeExecutionService._judging_plan(test_cases, problem)
+        # Test data fetches hit the database for legacy rows, checker setup looks up languages
+        test_data = await sync_to_async(CodeExecutionService._fetch_test_data)(test_cases)
+        checker = await sync_to_async(CodeExecutionService._make_checker)(problem)
+        inputs = {test_case_id: executor.stage_test_data(paths[0]) for test_case_id, paths in test_data.items()}
+        try:
+            results = {}
+            run_seconds = 0.0
+            for wave in CodeExecutionService._waves(groups, fail_fast, results):
+                start = time.perf_counter()
+                wave_results = await self._run_test_cases(
+                    executor, wave, inputs, time_limit_sec, stop_on_failure=fail_fast
+                )
+                run_seconds += time.perf_counter() - start
+
+                # Comparison is CPU-bound and checker programs are run synchronously
+                start = time.perf_counter()
+                await asyncio.to_thread(
+                    CodeExecutionService._check_results, checker, test_data, wave, wave_results
+                )
+                add_timing(timings, 'check', time.perf_counter() - start)
+                for test_case, result in zip(wave, wave_results):
+                    results[test_case.id] = result
+
+            add_timing(timings, 'compile', executor.compile_seconds)
+            add_timing(timings, 'run', max(0.0, run_seconds - executor.compile_seconds))
+        finally:
+            await asyncio.to_thread(checker.cleanup)
+        return CodeExecutionService._collect_results(test_cases, results)
+
+    async def _run_test_cases(self, executor, test_cases, inputs, time_limit_sec, stop_on_failure=False):
+        if not test_cases:
+            return []
+
+        workers = max(1, CodeExecutionService._parallelism(len(test_cases)))
+        chunks = [test_cases[i::workers] for i in range(workers)]
+        chunk_results = await asyncio.gather(*(
+            self._run_chunk(executor, chunk, inputs, time_limit_sec, stop_on_failure)
+            for chunk in chunks
+        ))
+
+        results = [None] * len(test_cases)
+        for i, chunk_result in enumerate(chunk_results):
+            results[i::workers] = chunk_result
+        return results
+
+    async def _run_chunk(self, executor, test_cases, inputs, time_limit_sec, stop_on_failure=False):
+        async with self.budget.slot(executor.sandbox_memory_mb) as cpu:
+            if settings.JUDGE_BATCH_MODE:
+                names = [inputs[test_case.id] for test_case in test_cases]
+                return await executor.execute_batch_async(
+                    names, time_limit_sec, cpuset=cpu, stop_on_failure=stop_on_failure
+                )
+
+            results = []
+            for test_case in test_cases:
+                if stop_on_failure and results and results[-1]['status'] != 'SUCCESS':
+                    results.append(CodeExecutionService._skipped_result())
+                    continue
+                results += await executor.execute_batch_async([inputs[test_case.id]], time_limit_sec, cpuset=cpu)
+            return results
@@ -0,0 +1,533 @@
+import asyncio
+import json
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from utils.exceptions import CodeExecutionError
+
+from .checker import read_excerpt
+from .compile_cache import get_compile_cache
+
+ARTIFACT_NAME = "program"
+COMPILE_TIMEOUT_SEC = 30
+
+HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "harness.py")
+BATCH_SESSION_OVERHEAD_SEC = 10
+DEFAULT_SANDBOX_MEMORY_MB = 100
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def get_executor_class():
+    """Executor backend selected by the JUDGE_EXECUTOR_BACKEND setting."""
+    return import_string(settings.JUDGE_EXECUTOR_BACKEND)
+
+
+class BaseExecutor:
+    """
+    Common part of every executor backend.
+
+    A backend only decides *where* things run: how a compile command is
+    started, how paths look from inside the sandbox and how a harness
+    session is started. What to compile and run comes from the language
+    runtime. Writing the code and inputs, the compile cache, the harness
+    manifest and turning harness output into results are shared.
+    """
+    python_binary = "python3"
+
+    def __init__(self, code: str, runtime, memory_limit_mb: float = None):
+        self.code = code
+        self.runtime = runtime
+        self.memory_limit_mb = memory_limit_mb
+        self.sandbox_memory_mb = self._sandbox_memory_mb()
+        self.temp_dir = self._make_temp_dir()
+        self.filename = runtime.source_filename or f"{uuid4().hex}.{runtime.extension}"
+        self.file_path = os.path.join(self.temp_dir, self.filename)
+        self._compiled = None
+        # Time spent compiling or fetching from the compile cache, for stage timings
+        self.compile_seconds = 0.0
+        self._lock = threading.Lock()
+        self._write_code()
+
+    def _sandbox_memory_mb(self):
+        if self.memory_limit_mb is None:
+            return DEFAULT_SANDBOX_MEMORY_MB
+        # The limit applies to the program; the harness and runtime get some headroom
+        return int(self.memory_limit_mb + settings.SANDBOX_MEMORY_OVERHEAD_MB)
+
+    def _make_temp_dir(self):
+        return tempfile.mkdtemp()
+
+    def _write_code(self):
+        with open(self.file_path, "w") as f:
+            f.write(self.code)
+        os.chmod(self.file_path, 0o644)
+
+    def _write_file(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o644)
+        return name
+
+    def stage_input(self, name, input_data):
+        """
+        Materialize one test input as a read-only file under inputs/.
+
+        Inputs are written once per executor and redirected straight to the
+        program's stdin by the harness, so they never travel through argv
+        or a pipe fed from Python. Returns the staged name for
+        execute_batch().
+        """
+        inputs_dir = os.path.join(self.temp_dir, "inputs")
+        os.makedirs(inputs_dir, mode=0o755, exist_ok=True)
+        path = os.path.join(inputs_dir, name)
+
+        # lstrip() only copies when there is leading whitespace to drop, and
+        # the trailing newline is written separately instead of concatenated
+        data = input_data.lstrip()
+        with open(path, "w") as f:
+            f.write(data)
+            if not data.endswith("\n"):
+                f.write("\n")
+        os.chmod(path, 0o444)
+        return f"inputs/{name}"
+
+    def stage_test_data(self, path):
+        """
+        Place a file from a test data cache under inputs/, returning its
+        staged name for execute_batch().
+
+        The caches are never mounted into sandboxes, so a program can only
+        read the test data staged into its own work directory. Files are
+        hard-linked when the cache is on the same filesystem, so staging
+        costs no copy.
+        """
+        inputs_dir = os.path.join(self.temp_dir, "inputs")
+        os.makedirs(inputs_dir, mode=0o755, exist_ok=True)
+        name = f"{uuid4().hex}.in"
+        destination = os.path.join(inputs_dir, name)
+        try:
+            os.link(path, destination)
+        except OSError:
+            shutil.copyfile(path, destination)
+            os.chmod(destination, 0o444)
+        return f"inputs/{name}"
+
+    def _sandbox_path(self, name):
+        """Path of a file in the work directory as seen from inside the sandbox."""
+        return os.path.join(self.temp_dir, name)
+
+    def _compile_path(self, name):
+        """Path of a file in the work directory as seen by the compiler."""
+        return os.path.join(self.temp_dir, name)
+
+    def _compile_command(self, command):
+        """Wrap a formatted compile command so it runs in the right environment."""
+        raise NotImplementedError
+
+    def _compile_popen_kwargs(self):
+        """Extra subprocess arguments for the compiler, e.g. a preexec_fn."""
+        return {}
+
+    def _toolchain_id(self):
+        """Identifies the compilers in use, for the compile cache key."""
+        raise NotImplementedError
+
+    def _format_command(self, template, path):
+        """
+        Expand a language command template into argv. `path` maps a work
+        directory file name to the path the command will see.
+        """
+        values = {
+            "file": path(self.filename),
+            "executable": path(ARTIFACT_NAME),
+            "dir": path("").rstrip("/"),
+            "class": os.path.splitext(self.filename)[0],
+        }
+        return [token.format(**values) for token in shlex.split(template)]
+
+    def _run_session(self, harness_command, timeout, reader, cpuset=None):
+        """
+        Run the harness in a sandbox, returning what `reader` makes of its
+        stdout. Backends start the process through _stream_harness().
+        """
+        raise NotImplementedError
+
+    def _stream_harness(self, command, timeout, reader, **popen_kwargs):
+        """
+        Start the harness and hand its stdout to `reader` while it runs.
+
+        Output is consumed as it is produced instead of being collected
+        with communicate(), so memory use does not grow with program
+        output. Raises subprocess.TimeoutExpired if the session outlives
+        `timeout`, and RuntimeError if the harness itself fails.
+        """
+        with tempfile.TemporaryFile() as stderr:
+            proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, **popen_kwargs)
+            timed_out = threading.Event()
+
+            def kill():
+                timed_out.set()
+                proc.kill()
+
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+            try:
+                result = reader(proc.stdout)
+                proc.wait()
+            except Exception:
+                # A killed session leaves a truncated stream behind
+                if not timed_out.is_set():
+                    raise
+            finally:
+                timer.cancel()
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                proc.stdout.close()
+
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(command, timeout)
+            if proc.returncode != 0:
+                stderr.seek(0)
+                message = stderr.read(OUTPUT_CHUNK_SIZE).decode(errors="replace").strip()
+                raise RuntimeError(message or "Harness exited with an error")
+            return result
+
+    async def _run_session_async(self, harness_command, timeout, reader, cpuset=None):
+        """
+        _run_session() for the asyncio judge worker; `reader` is a
+        coroutine function. Backends start the process through
+        _stream_harness_async().
+        """
+        raise NotImplementedError
+
+    async def _stream_harness_async(self, command, timeout, reader, **popen_kwargs):
+        """_stream_harness() on an asyncio subprocess, with the same errors."""
+        with tempfile.TemporaryFile() as stderr:
+            proc = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.PIPE, stderr=stderr, **popen_kwargs
+            )
+
+            async def session():
+                result = await reader(proc.stdout)
+                await proc.wait()
+                return result
+
+            try:
+                result = await asyncio.wait_for(session(), timeout)
+            except asyncio.TimeoutError:
+                raise subprocess.TimeoutExpired(command, timeout)
+            finally:
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+
+            if proc.returncode != 0:
+                stderr.seek(0)
+                message = stderr.read(OUTPUT_CHUNK_SIZE).decode(errors="replace").strip()
+                raise RuntimeError(message or "Harness exited with an error")
+            return result
+
+    def _manifest_options(self, cpuset=None):
+        """Backend-specific extra keys for the harness manifest."""
+        return {}
+
+    def _compile(self):
+        """
+        Compile the submission once, returning (artifact_name, error_message).
+        A compiler that cannot be run or does not finish is a judge failure,
+        not the submission's, and raises CodeExecutionError instead.
+
+        The result is memoized for the lifetime of the executor, and, if the
+        language caches artifacts, successful builds go through the
+        content-addressed compile cache so identical code is never compiled
+        twice on this node.
+        """
+        with self._lock:
+            if self._compiled is None:
+                start = time.perf_counter()
+                self._compiled = self._compile_uncached()
+                self.compile_seconds = time.perf_counter() - start
+            return self._compiled
+
+    def _compile_uncached(self):
+        artifact_path = os.path.join(self.temp_dir, ARTIFACT_NAME)
+
+        cache = get_compile_cache()
+        cache_key = cache.make_key(self.code, self._toolchain_id(), [self.runtime.compile_command, self.runtime.source_filename])
+        if self.runtime.cache_artifacts and cache.fetch(cache_key, artifact_path):
+            return (ARTIFACT_NAME, "")
+
+        command = self._format_command(self.runtime.compile_command, self._compile_path)
+        try:
+            compile_proc = subprocess.run(
+                self._compile_command(command),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=COMPILE_TIMEOUT_SEC,
+                cwd=self.temp_dir,
+                **self._compile_popen_kwargs()
+            )
+        except subprocess.TimeoutExpired:
+            raise CodeExecutionError("Compilation timeout", error_type="JUDGE_ERROR")
+        except Exception as e:
+            raise CodeExecutionError("Compiler could not be run", error_type="JUDGE_ERROR", details=str(e))
+
+        if compile_proc.returncode != 0:
+            return (None, compile_proc.stderr.decode(errors="replace").strip())
+        if not os.path.exists(artifact_path):
+            return (None, f"Compilation did not produce {ARTIFACT_NAME}")
+
+        if self.runtime.cache_artifacts:
+            try:
+                cache.put(cache_key, artifact_path)
+            except OSError as e:
+                # A cache failure must never fail the submission
+                logger.warning(f"Failed to cache compiled artifact: {e}")
+        return (ARTIFACT_NAME, "")
+
+    def _program_command(self):
+        """Return (command, compile_error) for running the submission."""
+        if self.runtime.compiled:
+            artifact_name, compile_error = self._compile()
+            if artifact_name is None:
+                return (None, compile_error)
+        return (self._format_command(self.runtime.execute_command, self._sandbox_path), "")
+
+    def execute(self, input_data: str, time_limit_sec: float, cpuset=None):
+        """Run a single input, returning (output, error, status, execution_time)."""
+        name = self.stage_input(f"{uuid4().hex}.in", input_data)
+        result = self.execute_batch([name], time_limit_sec, cpuset=cpuset)[0]
+        return (result["output"], result["error"], result["status"], result["execution_time"])
+
+    def execute_batch(self, inputs, time_limit_sec: float, cpuset=None, stop_on_failure=False):
+        """
+        Run the program against every staged input in one sandbox session.
+
+        `inputs` are names returned by stage_input() or stage_test_data(),
+        which sandboxes see read-only. A manifest and the
+        harness are written next to the code; the harness then runs each
+        case in turn inside the sandbox. `time_limit_sec` limits CPU
+        (user + sys) time; wall-clock time is only bounded by
+        JUDGE_WALL_TIME_MULTIPLIER times that, to catch programs that block.
+        Returns one result dict per input, in the same order. With
+        `stop_on_failure` the harness stops at the first crash, timeout or
+        memory overrun and reports the remaining cases as SKIPPED. Failures
+        of the sandbox itself are reported as JUDGE_ERROR.
+        """
+        command, compile_error = self._program_command()
+        if command is None:
+            return [self._error_result(compile_error, "COMPILATION_ERROR") for _ in inputs]
+
+        batch_id, harness_command, session_timeout = self._prepare_batch(
+            command, inputs, time_limit_sec, cpuset, stop_on_failure
+        )
+        try:
+            cases = self._run_session(
+                harness_command,
+                session_timeout,
+                lambda stream: self._read_cases(stream, batch_id, len(inputs)),
+                cpuset
+            )
+        except subprocess.TimeoutExpired:
+            return [self._error_result("Time limit exceeded", "TIME_LIMIT_EXCEEDED") for _ in inputs]
+        except Exception as e:
+            return [self._error_result(f"Batch execution failed: {str(e)}", "JUDGE_ERROR") for _ in inputs]
+        return self._batch_results(cases, inputs, time_limit_sec)
+
+    async def execute_batch_async(self, inputs, time_limit_sec: float, cpuset=None, stop_on_failure=False):
+        """
+        execute_batch() for the asyncio judge worker.
+
+        The sandbox session is an asyncio subprocess, so one event loop can
+        drive many sessions at once. Compilation is a one-off per executor
+        and runs in a thread.
+        """
+        command, compile_error = await asyncio.to_thread(self._program_command)
+        if command is None:
+            return [self._error_result(compile_error, "COMPILATION_ERROR") for _ in inputs]
+
+        batch_id, harness_command, session_timeout = self._prepare_batch(
+            command, inputs, time_limit_sec, cpuset, stop_on_failure
+        )
+        try:
+            cases = await self._run_session_async(
+                harness_command,
+                session_timeout,
+                lambda stream: self._read_cases_async(stream, batch_id, len(inputs)),
+                cpuset
+            )
+        except subprocess.TimeoutExpired:
+            return [self._error_result("Time limit exceeded", "TIME_LIMIT_EXCEEDED") for _ in inputs]
+        except Exception as e:
+            return [self._error_result(f"Batch execution failed: {str(e)}", "JUDGE_ERROR") for _ in inputs]
+        return self._batch_results(cases, inputs, time_limit_sec)
+
+    def _prepare_batch(self, command, inputs, time_limit_sec, cpuset, stop_on_failure):
+        """Write the manifest and harness, returning (batch_id, harness_command, session_timeout)."""
+        wall_time_limit_sec = time_limit_sec * settings.JUDGE_WALL_TIME_MULTIPLIER
+
+        # Several batches of one submission may run concurrently, so manifests are prefixed
+        batch_id = uuid4().hex[:8]
+        manifest = self._write_file(f"{batch_id}_manifest.json", json.dumps({
+            "command": command,
+            "inputs": [self._sandbox_path(name) for name in inputs],
+            "time_limit": time_limit_sec,
+            "wall_time_limit": wall_time_limit_sec,
+            "stop_on_failure": stop_on_failure,
+            "memory_limit_kb": int(self.memory_limit_mb * 1024) if self.memory_limit_mb else None,
+            "output_limit": settings.JUDGE_OUTPUT_LIMIT,
+            **self._manifest_options(cpuset),
+        }))
+        self._install_harness()
+
+        harness_command = [self.python_binary, self._sandbox_path("harness.py"), self._sandbox_path(manifest)]
+        # Per-case limits are enforced by the harness, this only guards the session
+        session_timeout = wall_time_limit_sec * len(inputs) + BATCH_SESSION_OVERHEAD_SEC
+        return batch_id, harness_command, session_timeout
+
+    def _batch_results(self, cases, inputs, time_limit_sec):
+        if len(cases) != len(inputs):
+            return [self._error_result("Batch execution failed: incomplete harness output", "JUDGE_ERROR") for _ in inputs]
+        return [self._batch_result(case, time_limit_sec) for case in cases]
+
+    def _outputs_dir(self):
+        # Kept out of reach of the sandbox user, unlike inputs
+        outputs_dir = os.path.join(self.temp_dir, "outputs")
+        os.makedirs(outputs_dir, mode=0o700, exist_ok=True)
+        return outputs_dir
+
+    def _read_cases(self, stream, batch_id, count):
+        """
+        Parse the harness stream, spooling each case's stdout to a file.
+
+        Program output is copied chunk by chunk into outputs/ on the host
+        and only its path is kept, so it can be compared and excerpted
+        without ever being loaded whole.
+        """
+        outputs_dir = self._outputs_dir()
+
+        cases = []
+        for index in range(count):
+            header = stream.readline()
+            if not header:
+                break
+            case = json.loads(header)
+            remaining = case.pop("stdout_size", 0)
+
+            output_path = os.path.join(outputs_dir, f"{batch_id}_{index}.out")
+            with open(output_path, "wb") as f:
+                while remaining > 0:
+                    chunk = stream.read(min(OUTPUT_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise RuntimeError("Harness output ended in the middle of a case")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            case["output_path"] = output_path
+            cases.append(case)
+        return cases
+
+    async def _read_cases_async(self, stream, batch_id, count):
+        """_read_cases() for an asyncio.StreamReader."""
+        outputs_dir = self._outputs_dir()
+
+        cases = []
+        for index in range(count):
+            header = await stream.readline()
+            if not header:
+                break
+            case = json.loads(header)
+            remaining = case.pop("stdout_size", 0)
+
+            output_path = os.path.join(outputs_dir, f"{batch_id}_{index}.out")
+            with open(output_path, "wb") as f:
+                while remaining > 0:
+                    chunk = await stream.read(min(OUTPUT_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise RuntimeError("Harness output ended in the middle of a case")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            case["output_path"] = output_path
+            cases.append(case)
+        return cases
+
+    def _install_harness(self):
+        harness_path = os.path.join(self.temp_dir, "harness.py")
+        with self._lock:
+            if not os.path.exists(harness_path):
+                shutil.copy(HARNESS_PATH, harness_path)
+                os.chmod(harness_path, 0o644)
+
+    def _batch_result(self, case, time_limit_sec):
+        if "error" in case:
+            # The harness could not run the case, which says nothing about the program
+            return self._error_result(case["error"], "JUDGE_ERROR")
+        if case.get("skipped"):
+            return self._error_result("", "SKIPPED")
+
+        result = {
+            "output": read_excerpt(case["output_path"]),
+            "output_path": case["output_path"],
+            "error": "",
+            "status": "SUCCESS",
+            "execution_time": case["cpu_time"],
+            "wall_time": case["wall_time"],
+            "cpu_time": case["cpu_time"],
+            "memory_used": round(case["memory_kb"] / 1024, 2),
+            "exit_code": case["exit_code"],
+        }
+        if case.get("output_exceeded"):
+            result.update(
+                error="Output limit exceeded",
+                status="OUTPUT_LIMIT_EXCEEDED"
+            )
+        elif case["timed_out"]:
+            result.update(
+                output="",
+                error="Time limit exceeded",
+                status="TIME_LIMIT_EXCEEDED",
+                # A program killed for idling used less CPU than the limit
+                execution_time=max(case["cpu_time"], int(time_limit_sec * 1000))
+            )
+        elif case.get("memory_exceeded"):
+            result.update(
+                output="",
+                error="Memory limit exceeded",
+                status="MEMORY_LIMIT_EXCEEDED"
+            )
+        elif case["exit_code"] != 0:
+            result.update(
+                error=case["stderr"].strip() or "Runtime error occurred",
+                status="RUNTIME_ERROR"
+            )
+        return result
+
+    @staticmethod
+    def _error_result(error, status):
+        return {
+            "output": "",
+            "output_path": None,
+            "error": error,
+            "status": status,
+            "execution_time": 0,
+            "wall_time": 0,
+            "cpu_time": 0,
+            "memory_used": 0,
+            "exit_code": None,
+        }
+
+    def cleanup(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
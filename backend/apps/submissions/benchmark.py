@@ -0,0 +1,238 @@
+"""
+End-to-end judge benchmark, driven by `manage.py benchmark_judge`.
+
+Synthetic problems (sum the numbers of each test) are created with a given
+number of test cases and numbers per test. Accepted, wrong, too slow and
+non-compiling solutions in Python and C++ are then judged through
+CodeExecutionService.execute_code with whichever executor backend is
+selected, including the in-process FakeExecutor. Submissions are judged
+directly, not queued, so the numbers measure the judge and not the broker.
+
+Time is attributed to stages by wrapping the judge's own steps. A stage
+nested in another on the same thread is subtracted from its parent, so the
+stages add up to the latency of a submission, except that a compile done
+on a parallel test-run thread is also counted in `run`.
+"""
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+
+from apps.problems.models import Problem, TestCase
+
+from .base_executor import BaseExecutor
+from .models import Language, Submission
+from .services import CodeExecutionService
+
+BENCHMARK_USERNAME = 'judge-benchmark'
+
+SOLUTIONS = {
+    'py': {
+        'ACCEPTED': (
+            "# bench: ACCEPTED\n"
+            "import sys\n"
+            "numbers = sys.stdin.read().split()\n"
+            "print(sum(map(int, numbers[1:])))\n"
+        ),
+        'WRONG_ANSWER': (
+            "# bench: WRONG_ANSWER\n"
+            "import sys\n"
+            "numbers = sys.stdin.read().split()\n"
+            "print(sum(map(int, numbers[1:])) + 1)\n"
+        ),
+        'TIME_LIMIT_EXCEEDED': (
+            "# bench: TIME_LIMIT_EXCEEDED\n"
+            "while True:\n"
+            "    pass\n"
+        ),
+        'COMPILATION_ERROR': (
+            "# bench: COMPILATION_ERROR\n"
+            "def solve(:\n"
+        ),
+    },
+    'cpp': {
+        'ACCEPTED': (
+            "// bench: ACCEPTED\n"
+            "#include <cstdio>\n"
+            "int main() { long long n, x, s = 0; scanf(\"%lld\", &n);"
+            " while (n-- && scanf(\"%lld\", &x) == 1) s += x; printf(\"%lld\\n\", s); }\n"
+        ),
+        'WRONG_ANSWER': (
+            "// bench: WRONG_ANSWER\n"
+            "#include <cstdio>\n"
+            "int main() { long long n, x, s = 1; scanf(\"%lld\", &n);"
+            " while (n-- && scanf(\"%lld\", &x) == 1) s += x; printf(\"%lld\\n\", s); }\n"
+        ),
+        'TIME_LIMIT_EXCEEDED': (
+            "// bench: TIME_LIMIT_EXCEEDED\n"
+            "int main() { volatile unsigned long long i = 0; for (;;) i++; }\n"
+        ),
+        'COMPILATION_ERROR': (
+            "// bench: COMPILATION_ERROR\n"
+            "int main() { return undefined_name; }\n"
+        ),
+    },
+}
+
+# A Python syntax error only shows up when the program runs
+EXPECTED_VERDICTS = {
+    ('py', 'COMPILATION_ERROR'): 'RUNTIME_ERROR',
+}
+
+STAGES = (
+    (CodeExecutionService, '_start', 'setup'),
+    (CodeExecutionService, '_fetch_test_data', 'test_data'),
+    (BaseExecutor, '_compile', 'compile'),
+    (CodeExecutionService, '_run_test_cases', 'run'),
+    (CodeExecutionService, '_check_results', 'check'),
+    (CodeExecutionService, '_finish', 'persist'),
+)
+
+
+class StageTimer:
+    """Self time per stage, summed over every submission judged."""
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _wrap(self, stage, function):
+        def timed(*args, **kwargs):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.totals[stage] = self.totals.get(stage, 0.0) + elapsed - children
+        return timed
+
+    @contextmanager
+    def installed(self):
+        originals = []
+        for owner, name, stage in STAGES:
+            original = owner.__dict__[name]
+            originals.append((owner, name, original))
+            if isinstance(original, staticmethod):
+                setattr(owner, name, staticmethod(self._wrap(stage, original.__func__)))
+            else:
+                setattr(owner, name, self._wrap(stage, original))
+        try:
+            yield self
+        finally:
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+
+class QueryCounter:
+    """
+    Database wrapper (connection.execute_wrapper) counting queries and the
+    time spent in them, summed over every thread it is installed on.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.queries += 1
+                self.seconds += elapsed
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def parse_problem_specs(specs):
+    """'5x100,20x1000' -> [(5, 100), (20, 1000)]: test cases x numbers per test."""
+    parsed = []
+    for spec in specs.split(','):
+        tests, numbers = spec.strip().lower().split('x')
+        parsed.append((int(tests), int(numbers)))
+    return parsed
+
+
+def create_problems(user, specs, policy, seed):
+    rng = random.Random(seed)
+    problems = []
+    for tests, numbers in specs:
+        problem = Problem.objects.create(
+            title=f"Benchmark {tests}x{numbers}",
+            slug=f"judge-benchmark-{tests}x{numbers}-{uuid4().hex[:8]}",
+            description="Print the sum of the numbers.",
+            difficulty='EASY',
+            category='Benchmark',
+            constraints='',
+            sample_input='',
+            sample_output='',
+            explanation='',
+            judging_policy=policy,
+            created_by=user,
+            is_active=False,
+        )
+        for order in range(tests):
+            values = [rng.randint(-10 ** 9, 10 ** 9) for _ in range(numbers)]
+            TestCase.objects.create(
+                problem=problem,
+                input_data=f"{numbers}\n{' '.join(map(str, values))}\n",
+                expected_output=f"{sum(values)}\n",
+                is_sample=order == 0,
+                order=order,
+            )
+        problems.append(problem)
+    return problems
+
+
+def build_workload(user, problems, languages, kinds, repeat, unique_code, seed):
+    """Create the submissions to judge, as (submission, expected verdict) pairs."""
+    workload = []
+    for _ in range(repeat):
+        for problem in problems:
+            for extension, language in languages.items():
+                for kind in kinds:
+                    code = SOLUTIONS[extension][kind]
+                    if unique_code:
+                        # Keeps the compile cache from turning every build after the first into a hit
+                        comment = '#' if extension == 'py' else '//'
+                        code += f"{comment} {uuid4().hex}\n"
+                    submission = Submission.objects.create(
+                        user=user, problem=problem, language=language, code=code, status='PENDING'
+                    )
+                    workload.append((submission, EXPECTED_VERDICTS.get((extension, kind), kind)))
+    random.Random(seed).shuffle(workload)
+    return workload
+
+
+def get_benchmark_user():
+    user, _ = get_user_model().objects.get_or_create(
+        username=BENCHMARK_USERNAME,
+        defaults={'email': f'{BENCHMARK_USERNAME}@example.invalid'},
+    )
+    return user
+
+
+def get_languages(extensions):
+    languages = {}
+    for extension in extensions:
+        language = Language.objects.filter(file_extension=extension, is_active=True).first()
+        if language is None:
+            raise Language.DoesNotExist(f"No active .{extension} language; run setup_languages first")
+        languages[extension] = language
+    return languages
@@ -0,0 +1,274 @@
+"""
+Output checker engine.
+
+Program output is compared against the expected output according to the
+problem's checker mode:
+
+  EXACT             identical apart from whitespace at either end
+  WHITESPACE        same tokens, any amount or kind of whitespace between them
+  TOKEN             same tokens, numbers compared by value ("1" == "1.0")
+  FLOAT             same tokens, numbers within the problem's tolerances
+  CASE_INSENSITIVE  same tokens, ignoring case
+
+Both sides are read as binary streams in large segments that never split a
+token. Each segment is tokenized with bytes.split() and compared as a whole
+with NumPy, parsing numbers for the entire segment at once, so outputs
+of millions of numbers never go through a per-token Python loop.
+Comparison stops at the first mismatching segment and reports the byte
+offset of the first mismatching token in the program output, which is used
+to cut a bounded excerpt for storage.
+"""
+import re
+from itertools import chain, islice
+
+import numpy as np
+from django.conf import settings
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = b" \t\n\r\x0b\x0c"
+TOKEN_RE = re.compile(rb"\S+")
+
+NUMERIC_MODES = ("TOKEN", "FLOAT")
+
+
+def iter_segments(stream, chunk_size=CHUNK_SIZE):
+    """Yield (offset, segment) pieces of `stream` that never split a token."""
+    buffer = b""
+    start = 0  # stream offset of buffer[0]
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            if buffer:
+                yield start, buffer
+            return
+        buffer += chunk
+        # A token running into the end of the buffer may continue in the next chunk
+        cut = max(buffer.rfind(c) for c in WHITESPACE) + 1
+        if cut:
+            yield start, buffer[:cut]
+            buffer = buffer[cut:]
+            start += cut
+
+
+def token_offset(segment, index):
+    """Offset within `segment` of its index-th token."""
+    match = next(islice(TOKEN_RE.finditer(segment), index, None))
+    return match.start()
+
+
+class TokenReader:
+    """Whitespace-separated tokens of a binary stream, read a segment at a time."""
+
+    def __init__(self, stream, fold_case=False):
+        self._segments = iter_segments(stream)
+        self._fold_case = fold_case
+        self._tokens = []
+        self._pos = 0
+        self.segment = b""
+        self.segment_offset = 0
+        self.end = 0  # offset just past the last token read
+
+    def next_block(self):
+        """Tokens of the next segment that has any, or None at the end of the stream."""
+        for offset, segment in self._segments:
+            if self._fold_case:
+                segment = segment.lower()
+            tokens = segment.split()
+            if tokens:
+                self.segment, self.segment_offset = segment, offset
+                self.end = offset + len(segment.rstrip())
+                return tokens
+        return None
+
+    def take(self, count):
+        """The next `count` tokens, fewer at the end of the stream."""
+        while len(self._tokens) - self._pos < count:
+            tokens = self.next_block()
+            if tokens is None:
+                break
+            self._tokens = self._tokens[self._pos:] + tokens
+            self._pos = 0
+        block = self._tokens[self._pos:self._pos + count]
+        self._pos += len(block)
+        return block
+
+
+def parse_floats(tokens):
+    """Parse a bytes array into floats, NaN where a token is not a number."""
+    try:
+        return tokens.astype(np.float64)
+    except ValueError:
+        # Some token is not a number; only then fall back to parsing one by one
+        return np.array([_parse_float(token) for token in tokens], dtype=np.float64)
+
+
+def _parse_float(token):
+    try:
+        return float(token)
+    except ValueError:
+        return np.nan
+
+
+def _stripped_chunks(stream):
+    """(offset, chunk) pieces of `stream` with leading whitespace dropped."""
+    offset = 0
+    leading = True
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        if leading:
+            stripped = chunk.lstrip()
+            offset += len(chunk) - len(stripped)
+            chunk = stripped
+            if not chunk:
+                continue
+            leading = False
+        yield offset, chunk
+        offset += len(chunk)
+
+
+def compare_exact(actual, expected):
+    """Compare two binary streams byte for byte, ignoring whitespace at either end."""
+    actual_chunks = _stripped_chunks(actual)
+    expected_chunks = _stripped_chunks(expected)
+    offset, a, e = 0, b"", b""
+    while True:
+        if not a:
+            offset, a = next(actual_chunks, (offset, b""))
+        if not e:
+            e = next(expected_chunks, (0, b""))[1]
+        if not a or not e:
+            break
+        n = min(len(a), len(e))
+        if a[:n] != e[:n]:
+            different = np.frombuffer(a, np.uint8, n) != np.frombuffer(e, np.uint8, n)
+            return (False, offset + int(np.argmax(different)))
+        offset, a, e = offset + n, a[n:], e[n:]
+
+    # One side is exhausted; the other may only have trailing whitespace left
+    for chunk_offset, chunk in chain([(offset, a)], actual_chunks):
+        stripped = chunk.lstrip()
+        if stripped:
+            return (False, chunk_offset + len(chunk) - len(stripped))
+    if e.strip() or any(chunk.strip() for _, chunk in expected_chunks):
+        return (False, offset)
+    return (True, None)
+
+
+class OutputChecker:
+    """Compares program output with the expected output in one checker mode."""
+
+    def __init__(self, mode="TOKEN", abs_tolerance=0.0, rel_tolerance=0.0):
+        self.mode = mode
+        self.abs_tolerance = abs_tolerance
+        self.rel_tolerance = rel_tolerance
+
+    @classmethod
+    def for_problem(cls, problem):
+        return cls(problem.checker_mode, problem.float_abs_tolerance, problem.float_rel_tolerance)
+
+    def compare(self, output_path, expected_path):
+        """
+        Compare a spooled output file with a test case's expected output
+        file. Returns (matched, offset) where `offset` is the position in
+        the output of the first mismatch.
+        """
+        with open(output_path, "rb") as actual, open(expected_path, "rb") as expected:
+            if self.mode == "EXACT":
+                return compare_exact(actual, expected)
+            return self.compare_tokens(actual, expected)
+
+    def check(self, cases):
+        """
+        Check (result, input_path, expected_path) triples, returning
+        (matched, offset, message) for each.
+        """
+        return [
+            (*self.compare(result["output_path"], expected_path), "")
+            for result, _, expected_path in cases
+        ]
+
+    def cleanup(self):
+        pass
+
+    def compare_tokens(self, actual, expected):
+        fold_case = self.mode == "CASE_INSENSITIVE"
+        actual_tokens = TokenReader(actual, fold_case)
+        expected_tokens = TokenReader(expected, fold_case)
+        while True:
+            block = actual_tokens.next_block()
+            if block is None:
+                if expected_tokens.take(1):
+                    return (False, actual_tokens.end)
+                return (True, None)
+
+            reference = expected_tokens.take(len(block))
+            index = self.first_mismatch(block[:len(reference)], reference)
+            if index is None and len(reference) < len(block):
+                index = len(reference)
+            if index is not None:
+                return (False, actual_tokens.segment_offset + token_offset(actual_tokens.segment, index))
+
+    def first_mismatch(self, actual, expected):
+        """Index of the first mismatching token of two equal-length blocks, or None."""
+        if actual == expected:
+            return None
+
+        if self.mode in NUMERIC_MODES:
+            try:
+                # Usually the whole block is numbers: parse both sides in one go
+                actual_values = np.array(actual, dtype=np.float64)
+                expected_values = np.array(expected, dtype=np.float64)
+            except ValueError:
+                pass
+            else:
+                ok = self.numbers_match(actual_values, expected_values)
+                # "nan" is a valid answer when "nan" is expected
+                ok |= np.isnan(actual_values) & np.isnan(expected_values)
+                return self._first_false(ok)
+
+        actual = np.array(actual)
+        expected = np.array(expected)
+        different = np.flatnonzero(actual != expected)
+        if self.mode not in NUMERIC_MODES:
+            return int(different[0])
+
+        # Mixed text and numbers: only tokens that differ as text are parsed
+        ok = self.numbers_match(parse_floats(actual[different]), parse_floats(expected[different]))
+        wrong = different[~ok]
+        return int(wrong[0]) if wrong.size else None
+
+    def numbers_match(self, actual, expected):
+        with np.errstate(invalid="ignore"):
+            ok = actual == expected
+            if self.mode == "FLOAT":
+                allowed = np.maximum(self.abs_tolerance, self.rel_tolerance * np.abs(expected))
+                ok |= np.abs(actual - expected) <= allowed
+        return ok
+
+    @staticmethod
+    def _first_false(ok):
+        wrong = np.flatnonzero(~ok)
+        return int(wrong[0]) if wrong.size else None
+
+
+def read_excerpt(path, offset=0, size=None):
+    """
+    Read at most `size` bytes of `path` around `offset`, for storage and
+    display. Cut-off ends are marked with an ellipsis.
+    """
+    if path is None:
+        return ""
+    size = size or settings.JUDGE_OUTPUT_EXCERPT_SIZE
+    start = max(0, offset - size // 2)
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(size + 1)
+
+    excerpt = data[:size].decode(errors="replace")
+    if start > 0:
+        excerpt = "..." + excerpt
+    if len(data) > size:
+        excerpt += "..."
+    return excerpt.strip()
@@ -0,0 +1,132 @@
+"""
+Content-addressed cache for compiled artifacts.
+
+Artifacts are stored on local disk under a key of
+sha256(compiler image, flags, source), so rejudges and byte-identical
+resubmissions reuse the binary instead of compiling again. The cache is
+bounded in size and evicts least recently used artifacts first. Its size
+is tracked from inserts, so the cache directory is only scanned once at
+startup and again each time the running total crosses the limit.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Evict well below the limit so a full cache is not rescanned on every insert
+EVICT_TO = 0.9
+
+
+class CompileCache:
+    file_mode = 0o755
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last scan plus everything inserted since
+        self._size = None
+
+    @staticmethod
+    def make_key(source, image, flags):
+        digest = hashlib.sha256()
+        for part in (image, "\0".join(flags), source):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """Return the cached artifact path for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            # Touching the artifact records the hit for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, artifact_path):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial artifact
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            shutil.copyfile(artifact_path, temp_path)
+            os.chmod(temp_path, self.file_mode)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+        self.evict(size)
+        return path
+
+    def fetch(self, key, destination):
+        """Place the cached artifact at `destination`. Returns False on a miss."""
+        path = self.get(key)
+        if path is None:
+            return False
+        try:
+            os.link(path, destination)
+        except OSError:
+            shutil.copy2(path, destination)
+        return True
+
+    def evict(self, added=0):
+        """Record `added` inserted bytes, evicting down to max_size past it."""
+        with self._lock:
+            if self._size is not None:
+                self._size += added
+                if self._size <= self.max_size:
+                    return
+
+            entries = []
+            total = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            self._size = total
+            if total <= self.max_size:
+                return
+
+            entries.sort()
+            target = self.max_size * EVICT_TO
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+            self._size = total
+            logger.info(f"{type(self).__name__} evicted down to {total} bytes")
+
+
+_cache = None
+
+
+def get_compile_cache():
+    global _cache
+    if _cache is None:
+        _cache = CompileCache(settings.COMPILE_CACHE_DIR, settings.COMPILE_CACHE_MAX_SIZE)
+    return _cache
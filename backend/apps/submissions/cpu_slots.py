@@ -0,0 +1,61 @@
+"""
+Per-node CPU budget for sandbox runs.
+
+Each CPU in the budget is represented by a lock file; holding the lock
+means owning that core. Because the locks are plain `flock`s they are
+shared by every worker process on the node, so concurrent test runs never
+oversubscribe the judge box, and each run can be pinned to its own core
+for stable timings.
+"""
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+POLL_INTERVAL_SEC = 0.05
+
+
+class CpuSlots:
+    def __init__(self, lock_dir, cpus):
+        self.lock_dir = lock_dir
+        self.cpus = list(cpus)
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _try_lock(self, cpu):
+        fd = os.open(os.path.join(self.lock_dir, f"cpu{cpu}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Hold one CPU of the budget, yielding its id."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for cpu in self.cpus:
+                fd = self._try_lock(cpu)
+                if fd is not None:
+                    try:
+                        yield cpu
+                    finally:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+                        os.close(fd)
+                    return
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("No CPU available in the judge budget")
+            time.sleep(POLL_INTERVAL_SEC)
+
+
+_slots = None
+
+
+def get_cpu_slots():
+    global _slots
+    if _slots is None:
+        _slots = CpuSlots(settings.JUDGE_CPU_LOCK_DIR, range(settings.JUDGE_CPU_BUDGET))
+    return _slots
@@ -1,123 +1,173 @@
+import asyncio
+import logging
 import os
+import random
 import subprocess
 import tempfile
-import shutil
-from uuid import uuid4
-
-
-class DockerExecutor:
-    def __init__(self, code: str, extension: str, language: str):
-        self.code = code
-        self.extension = extension
-        self.language = language.lower()
-        self.temp_dir = tempfile.mkdtemp()
-        self.filename = f"{uuid4().hex}.{self.extension}"
-        self.file_path = os.path.join(self.temp_dir, self.filename)
-        self._write_code()
-
-    def _write_code(self):
-        with open(self.file_path, "w") as f:
-            f.write(self.code)
-
-    def execute(self, input_data: str, time_limit_sec: float):
-        if self.language == "python":
-            return self._run_python(input_data, time_limit_sec)
-        elif self.language in ("cpp", "c++"):
-            return self._run_cpp(input_data, time_limit_sec)
-        else:
-            return ("", f"Unsupported language: {self.language}", "COMPILATION_ERROR", 0)
-
-    def _run_python(self, input_data: str, time_limit_sec: float):
-        command = [
-            "docker", "run", "--rm",
-            "-i",
+from functools import lru_cache
+
+from django.conf import settings
+
+from .base_executor import BaseExecutor, HARNESS_PATH
+from .sandbox_pool import get_pool, SANDBOX_USER, WORK_MOUNT
+
+# Used for languages without an image of their own; the harness needs python3
+DEFAULT_IMAGE = "python:3.10-slim"
+IMAGE_CHECK_TIMEOUT_SEC = 300  # includes pulling the image
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def pool_enabled():
+    """
+    Whether sandboxes come from the warm pool. Pooled work dirs are kept
+    apart by giving each to a session uid, which takes root to chown; other
+    workers judge in per-run containers that only mount their own directory.
+    """
+    if not settings.SANDBOX_POOL_ENABLED:
+        return False
+    if os.geteuid() != 0:
+        logger.warning("SANDBOX_POOL_ENABLED needs a judge worker running as root; using per-run containers")
+        return False
+    return True
+
+
+def check_image(image):
+    """
+    Start the harness in `image` the way a sandbox session does. Returns
+    None if the image can judge, otherwise what went wrong.
+    """
+    command = [
+        "docker", "run", "--rm", "--network=none",
+        "-v", f"{HARNESS_PATH}:/judge/harness.py:ro",
+        image, DockerExecutor.python_binary, "/judge/harness.py", "--help"
+    ]
+    try:
+        proc = subprocess.run(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=IMAGE_CHECK_TIMEOUT_SEC
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return str(e)
+    if proc.returncode != 0:
+        return proc.stderr.decode(errors="replace").strip() or f"exit code {proc.returncode}"
+    return None
+
+
+def check_language_images():
+    """check_image() for the image of every active language: {image: (language names, error)}."""
+    from .models import Language
+    images = {}
+    for language in Language.objects.filter(is_active=True).order_by('name'):
+        images.setdefault(language.image or DEFAULT_IMAGE, []).append(language.name)
+    return {image: (names, check_image(image)) for image, names in images.items()}
+
+
+class DockerExecutor(BaseExecutor):
+    def __init__(self, code: str, runtime, memory_limit_mb: float = None):
+        self.use_pool = pool_enabled()
+        self.sandbox_user = None
+        super().__init__(code, runtime, memory_limit_mb)
+        self.container_memory = f"{self.sandbox_memory_mb}m"
+
+    def _make_temp_dir(self):
+        if not self.use_pool:
+            # Only this submission's containers mount it, so any unprivileged user will do
+            temp_dir = tempfile.mkdtemp()
+            if os.geteuid() == 0:
+                self.sandbox_user = SANDBOX_USER
+                uid, gid = map(int, SANDBOX_USER.split(":"))
+                os.chown(temp_dir, uid, gid)
+            else:
+                self.sandbox_user = f"{os.getuid()}:{os.getgid()}"
+            return temp_dir
+        # Every pooled sandbox mounts all of SANDBOX_WORK_ROOT, so each submission
+        # gets a directory only its own session uid can enter. It is named after
+        # the uid, which makes mkdir the claim and keeps concurrent uids distinct.
+        os.makedirs(settings.SANDBOX_WORK_ROOT, exist_ok=True)
+        while True:
+            uid = random.randrange(settings.SANDBOX_UID_BASE, settings.SANDBOX_UID_BASE + settings.SANDBOX_UID_COUNT)
+            temp_dir = os.path.join(settings.SANDBOX_WORK_ROOT, str(uid))
+            try:
+                os.mkdir(temp_dir, 0o700)
+                break
+            except FileExistsError:
+                continue
+        try:
+            os.chown(temp_dir, uid, uid)
+        except OSError:
+            os.rmdir(temp_dir)
+            raise
+        self.sandbox_user = f"{uid}:{uid}"
+        return temp_dir
+
+    def _sandbox_path(self, name):
+        if not self.use_pool:
+            return f"/code/{name}"
+        return f"{WORK_MOUNT}/{os.path.basename(self.temp_dir)}/{name}"
+
+    def _docker_run_args(self, cpuset=None):
+        args = ["docker", "run", "--rm", "-u", self.sandbox_user]
+        args += [
             "--cpus=0.5",
-            "--memory=100m",
+            f"--memory={self.container_memory}",
+            f"--memory-swap={self.container_memory}",
             "--network=none",
-            "-v", f"{self.temp_dir}:/code",
-            "python:3.10-slim",
-            "python", f"/code/{self.filename}"
         ]
-        return self._run_docker_command(command, input_data, time_limit_sec)
+        if cpuset is not None:
+            args.append(f"--cpuset-cpus={cpuset}")
+        # Code, binary and inputs are only ever read by the sandbox
+        return args + ["-v", f"{self.temp_dir}:/code:ro"]
+
+    def _image(self):
+        return self.runtime.image or DEFAULT_IMAGE
 
-    def _run_cpp(self, input_data: str, time_limit_sec: float):
-        binary_name = f"{uuid4().hex}"
-        binary_path = os.path.join(self.temp_dir, binary_name)
+    def _toolchain_id(self):
+        return self._image()
 
-        # Compile inside Docker with better error handling
-        compile_cmd = [
+    def _compile_path(self, name):
+        return f"/code/{name}"
+
+    def _compile_command(self, command):
+        # Compile inside the language's image, the only time the work directory is writable.
+        # Compilers run the submission's build, so they get the sandbox user and limits too.
+        memory = f"{settings.SANDBOX_COMPILE_MEMORY_MB}m"
+        return [
             "docker", "run", "--rm",
+            "-u", self.sandbox_user,
+            "--network=none",
+            f"--memory={memory}",
+            f"--memory-swap={memory}",
+            f"--pids-limit={settings.SANDBOX_COMPILE_PIDS_LIMIT}",
             "-v", f"{self.temp_dir}:/code",
-            "gcc:latest",
-            "g++", "-std=c++17", "-Wall", "-O2", "-g", f"/code/{self.filename}", "-o", f"/code/{binary_name}"
+            "-w", "/code",
+            self._image(),
+            *command
         ]
 
-        try:
-            compile_proc = subprocess.run(
-                compile_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=30  # 30 second compile timeout
-            )
+    def _run_session(self, harness_command, timeout, reader, cpuset=None):
+        if self.use_pool:
+            pool = get_pool(self._image(), memory=self.container_memory, cpuset=cpuset)
+            with pool.sandbox(timeout=settings.SANDBOX_POOL_ACQUIRE_TIMEOUT) as container:
+                return self._stream_harness(container.exec_command(harness_command, self.sandbox_user), timeout, reader)
+
+        command = self._docker_run_args(cpuset) + [self._image()] + harness_command
+        return self._stream_harness(command, timeout, reader)
+
+    async def _run_session_async(self, harness_command, timeout, reader, cpuset=None):
+        if not self.use_pool:
+            command = self._docker_run_args(cpuset) + [self._image()] + harness_command
+            return await self._stream_harness_async(command, timeout, reader)
 
-            if compile_proc.returncode != 0:
-                return ("", compile_proc.stderr.decode().strip(), "COMPILATION_ERROR", 0)
-
-            # Run compiled binary with proper stdin handling
-            command = [
-                "docker", "run", "--rm",
-                "-i",
-                "--cpus=0.5",
-                "--memory=100m",
-                "--network=none",
-                "-v", f"{self.temp_dir}:/code",
-                "gcc:latest",
-                "sh", "-c",
-                f"echo '{input_data}' | /code/{binary_name}"
-            ]
-
-            return self._run_docker_command(command, input_data, time_limit_sec)
-        
-        except subprocess.TimeoutExpired:
-            return ("", "Compilation timeout", "COMPILATION_ERROR", 0)
-        except Exception as e:
-            return ("", f"Compilation error: {str(e)}", "COMPILATION_ERROR", 0)
-
-    def _run_docker_command(self, command, input_data, time_limit_sec):
+        # The pool hands out containers under a threading condition and resets them with docker calls
+        pool = get_pool(self._image(), memory=self.container_memory, cpuset=cpuset)
+        container = await asyncio.to_thread(pool.acquire, settings.SANDBOX_POOL_ACQUIRE_TIMEOUT)
         try:
-            import time
-            start = time.time()
-            
-            # Ensure input_data ends with newline for proper stdin handling
-            if input_data and not input_data.endswith('\n'):
-                input_data += '\n'
-            
-            proc = subprocess.run(
-                command,
-                input=input_data,
-                text=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=time_limit_sec
+            result = await self._stream_harness_async(
+                container.exec_command(harness_command, self.sandbox_user), timeout, reader
             )
-            duration = int((time.time() - start) * 1000)
-            
-            # Better error handling
-            if proc.returncode != 0:
-                error_msg = proc.stderr.strip() if proc.stderr.strip() else "Runtime error occurred"
-                return (proc.stdout.strip(), error_msg, "RUNTIME_ERROR", duration)
-            
-            # Check if stderr has warnings but program executed successfully
-            if proc.stderr.strip():
-                # Log warnings but don't treat as error if returncode is 0
-                print(f"Warning: {proc.stderr.strip()}")
-            
-            return (proc.stdout.strip(), "", "SUCCESS", duration)
-            
-        except subprocess.TimeoutExpired:
-            return ("", "Time limit exceeded", "TIME_LIMIT_EXCEEDED", int(time_limit_sec * 1000))
-        except Exception as e:
-            return ("", str(e), "RUNTIME_ERROR", 0)
-
-    def cleanup(self):
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
\ No newline at end of file
+        except BaseException:
+            await asyncio.to_thread(pool.discard, container)
+            raise
+        await asyncio.to_thread(pool.release, container)
+        return result
@@ -0,0 +1,240 @@
+"""
+Fair-share dispatch of submissions to the judge queues.
+
+Celery queues are FIFO, so a user who submits fifty times at once would
+push everyone else's verdicts back. Submissions are therefore held in
+per-user queues in Redis. Only JUDGE_FAIR_SLOTS of them are handed to
+Celery at a time, and a slot is freed when the submission's last judge
+task finishes.
+
+Free slots are filled by deficit round-robin over the users with work
+waiting. Each visit adds JUDGE_FAIR_QUANTUM to a user's deficit. Their
+submissions are dispatched while the deficit covers the cost of the next
+one, which is the number of test cases it will run. Every active user
+gets an equal share of judge work, whatever their backlog, and a user who
+just submitted gets a slot within one round.
+
+A bulk rejudge is one flow of its own rather than part of its authors'
+flows, and gets JUDGE_FAIR_REJUDGE_WEIGHT of the quantum. It takes
+whatever judge capacity live users leave idle, but only a small share
+while they are waiting.
+
+The structures are:
+
+    fair:flow:<owner>  list of "<submission id>:<cost>" waiting, per user
+                       id or "rejudge:<rejudge id>"
+    fair:active        round-robin order of flows with work waiting
+    fair:deficit       hash of flow owner -> deficit
+    fair:in-flight     sorted set of dispatched submission ids by dispatch time
+
+They are changed under one Redis lock. A slot held for longer than
+JUDGE_FAIR_SLOT_TIMEOUT is taken back, in case a worker died with it, and
+dispatch_fair_queue_task runs periodically to catch up after that. Without
+a django-redis cache (development), or if Redis fails, submissions are
+queued directly.
+
+With JUDGE_WORKER set to 'async' nothing is handed to Celery. The asyncio
+judge worker takes submissions with take() instead, in the same order, and
+releases their slots when they are judged.
+"""
+import logging
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'fair:lock'
+ACTIVE_KEY = 'fair:active'
+DEFICIT_KEY = 'fair:deficit'
+IN_FLIGHT_KEY = 'fair:in-flight'
+REJUDGE_FLOW_PREFIX = 'rejudge:'
+
+
+def flow_key(user_id):
+    return f'fair:flow:{user_id}'
+
+
+def flow_owner(submission):
+    """The flow a submission waits in: its rejudge's, else its user's."""
+    if submission.rejudge_id:
+        return f'{REJUDGE_FLOW_PREFIX}{submission.rejudge_id}'
+    return submission.user_id
+
+
+def _connection():
+    if not settings.JUDGE_FAIR_SHARE:
+        return None
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def _lock(connection):
+    return connection.lock(LOCK_KEY, timeout=30, blocking_timeout=5)
+
+
+def _async_worker():
+    return settings.JUDGE_WORKER == 'async'
+
+
+def _dispatch_now(submission_ids):
+    from .services import CodeExecutionService
+    from .models import Submission
+    submissions = Submission.objects.select_related('problem', 'language').in_bulk(submission_ids)
+    for submission_id in submission_ids:
+        submission = submissions.get(submission_id)
+        if submission is None:
+            release(submission_id)
+            continue
+        CodeExecutionService.queue_submission(submission)
+
+
+def enqueue(submission):
+    """Queue a submission behind its flow's earlier ones and fill free slots."""
+    connection = _connection()
+    if connection is None:
+        # The async worker finds PENDING submissions by itself
+        if not _async_worker():
+            _dispatch_now([submission.id])
+        return
+
+    cost = max(1, submission.problem.test_cases.count())
+    owner = flow_owner(submission)
+    entry = f'{submission.id}:{cost}'
+    pushed = False
+    ready = None
+    try:
+        with _lock(connection):
+            length = connection.rpush(flow_key(owner), entry)
+            pushed = True
+            if length == 1:
+                # First submission waiting in this flow: join the round
+                connection.rpush(ACTIVE_KEY, owner)
+            ready = [] if _async_worker() else _take_ready(connection)
+    except Exception as e:
+        if ready is None:
+            # Judging must not stop because the fair queue is unavailable. An entry
+            # left in the flow would be dispatched again later, so it goes first.
+            if pushed and not _withdraw(connection, owner, entry):
+                logger.warning(f"Fair queue unavailable, submission {submission.id} stays queued: {e}")
+                return
+            logger.warning(f"Fair queue unavailable, queueing submission {submission.id} directly: {e}")
+            if not _async_worker():
+                _dispatch_now([submission.id])
+            return
+        # Only releasing the lock failed; the slots taken are still ours to fill
+        logger.warning(f"Failed to release the fair queue lock: {e}")
+    _dispatch_now(ready)
+
+
+def _withdraw(connection, owner, entry):
+    """Take a waiting entry out of its flow. False if Redis could not be reached."""
+    try:
+        connection.lrem(flow_key(owner), 1, entry)
+    except Exception:
+        return False
+    return True
+
+
+def release(submission_id):
+    """Free the judge slot of a submission, if it held one, and fill it."""
+    connection = _connection()
+    if connection is None:
+        return
+    try:
+        if connection.zrem(IN_FLIGHT_KEY, submission_id) and not _async_worker():
+            dispatch()
+    except Exception as e:
+        logger.warning(f"Failed to release the fair queue slot of submission {submission_id}: {e}")
+
+
+def dispatch():
+    """Hand submissions to Celery while there are free slots."""
+    connection = _connection()
+    if connection is None or _async_worker():
+        return
+    with _lock(connection):
+        ready = _take_ready(connection)
+    _dispatch_now(ready)
+
+
+def take(limit):
+    """
+    Give up to `limit` free slots to waiting submissions and return their
+    ids, for the async worker to judge. None without the fair queue.
+    """
+    connection = _connection()
+    if connection is None:
+        return None
+    with _lock(connection):
+        return _take_ready(connection, limit)
+
+
+def _take_ready(connection, limit=None):
+    """
+    Deficit round-robin over the active flows, under the lock. Returns the
+    submission ids that got a slot, to be queued once the lock is released.
+    """
+    now = time.time()
+    connection.zremrangebyscore(IN_FLIGHT_KEY, '-inf', now - settings.JUDGE_FAIR_SLOT_TIMEOUT)
+    free = settings.JUDGE_FAIR_SLOTS - connection.zcard(IN_FLIGHT_KEY)
+    if limit is not None:
+        free = min(free, limit)
+    ready = []
+
+    while free > 0:
+        user_id = connection.lpop(ACTIVE_KEY)
+        if user_id is None:
+            break
+        user_id = user_id.decode()
+        flow = flow_key(user_id)
+        quantum = settings.JUDGE_FAIR_QUANTUM
+        if user_id.startswith(REJUDGE_FLOW_PREFIX):
+            quantum *= settings.JUDGE_FAIR_REJUDGE_WEIGHT
+        deficit = float(connection.hget(DEFICIT_KEY, user_id) or 0) + quantum
+
+        while free > 0:
+            head = connection.lindex(flow, 0)
+            if head is None:
+                break
+            submission_id, cost = map(int, head.decode().split(':'))
+            if cost > deficit:
+                break
+            connection.lpop(flow)
+            connection.zadd(IN_FLIGHT_KEY, {submission_id: now})
+            deficit -= cost
+            free -= 1
+            ready.append(submission_id)
+
+        if connection.llen(flow):
+            connection.hset(DEFICIT_KEY, user_id, deficit)
+            connection.rpush(ACTIVE_KEY, user_id)
+        else:
+            # An idle user does not bank credit for later
+            connection.hdel(DEFICIT_KEY, user_id)
+    return ready
+
+
+def queue_depth(user_id):
+    """Submissions of a user still waiting for a judge slot."""
+    connection = _connection()
+    if connection is None:
+        return 0
+    return connection.llen(flow_key(user_id))
+
+
+def queue_stats():
+    """Waiting submissions per active flow, and how many hold a slot."""
+    connection = _connection()
+    if connection is None:
+        return {}, 0
+    users = [user_id.decode() for user_id in connection.lrange(ACTIVE_KEY, 0, -1)]
+    pipeline = connection.pipeline(transaction=False)
+    for user_id in users:
+        pipeline.llen(flow_key(user_id))
+    pipeline.zcard(IN_FLIGHT_KEY)
+    *depths, in_flight = pipeline.execute()
+    return dict(zip(users, depths)), in_flight
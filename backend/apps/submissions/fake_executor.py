@@ -0,0 +1,117 @@
+import asyncio
+import io
+import json
+import re
+import time
+
+from .base_executor import ARTIFACT_NAME, BaseExecutor
+
+OUTCOME_MARKER = re.compile(r"bench:\s*([A-Z_]+)")
+
+
+def reference_answer(input_path):
+    """Answer of the benchmark problem: the sum of the numbers after the count."""
+    with open(input_path) as f:
+        numbers = f.read().split()
+    return sum(int(number) for number in numbers[1:])
+
+
+class FakeExecutor(BaseExecutor):
+    """
+    In-process stand-in for a sandbox backend, for benchmarking the judge
+    on machines without Docker or namespaces.
+
+    Nothing is compiled or executed. The outcome of a program comes from a
+    `bench: <VERDICT>` marker in its code (ACCEPTED, WRONG_ANSWER,
+    TIME_LIMIT_EXCEEDED or COMPILATION_ERROR), and accepted programs
+    answer the benchmark problem (see reference_answer). Results are
+    written in the harness protocol and parsed by the real reader, so
+    everything around the sandbox (spooling, checking, verdicts,
+    persistence) runs as usual. `compile_delay_sec` and `run_delay_sec`
+    stand in for the cost of compiling and of each test run.
+    """
+    compile_delay_sec = 0.0
+    run_delay_sec = 0.0
+
+    def _toolchain_id(self):
+        return "fake"
+
+    def _compile_command(self, command):
+        return command
+
+    def _outcome(self):
+        match = OUTCOME_MARKER.search(self.code)
+        return match.group(1) if match else "ACCEPTED"
+
+    def _compile_uncached(self):
+        time.sleep(self.compile_delay_sec)
+        if self._outcome() == "COMPILATION_ERROR":
+            return (None, "fake: compilation failed")
+        return (ARTIFACT_NAME, "")
+
+    def _fake_case(self, input_path, outcome, time_limit_sec):
+        case = {
+            "cpu_time": 1,
+            "wall_time": 1,
+            "memory_kb": 1024,
+            "exit_code": 0,
+            "timed_out": False,
+            "stderr": "",
+        }
+        if outcome == "TIME_LIMIT_EXCEEDED":
+            case.update(timed_out=True, exit_code=-9, cpu_time=int(time_limit_sec * 1000))
+            return case, b""
+        if outcome == "COMPILATION_ERROR":
+            # Interpreted languages only find out when the program starts
+            case.update(exit_code=1, stderr="SyntaxError: invalid syntax")
+            return case, b""
+
+        answer = reference_answer(input_path)
+        if outcome == "WRONG_ANSWER":
+            answer += 1
+        return case, f"{answer}\n".encode()
+
+    def _fake_stream(self, harness_command):
+        """Harness output for a session, and how many cases were "run"."""
+        with open(harness_command[-1]) as f:
+            manifest = json.load(f)
+
+        outcome = self._outcome()
+        stream = io.BytesIO()
+        ran = 0
+        failed = False
+        for input_path in manifest["inputs"]:
+            if failed and manifest["stop_on_failure"]:
+                stream.write(json.dumps({"skipped": True, "stdout_size": 0}).encode() + b"\n")
+                continue
+
+            case, stdout = self._fake_case(input_path, outcome, manifest["time_limit"])
+            case["stdout_size"] = len(stdout)
+            stream.write(json.dumps(case).encode() + b"\n" + stdout)
+            ran += 1
+            failed = case["timed_out"] or case["exit_code"] != 0
+
+        stream.seek(0)
+        return stream, ran
+
+    def _run_session(self, harness_command, timeout, reader, cpuset=None):
+        stream, ran = self._fake_stream(harness_command)
+        time.sleep(self.run_delay_sec * ran)
+        return reader(stream)
+
+    async def _run_session_async(self, harness_command, timeout, reader, cpuset=None):
+        stream, ran = self._fake_stream(harness_command)
+        await asyncio.sleep(self.run_delay_sec * ran)
+        return await reader(_AsyncStream(stream))
+
+
+class _AsyncStream:
+    """Enough of asyncio.StreamReader over a byte buffer for _read_cases_async()."""
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def readline(self):
+        return self.stream.readline()
+
+    async def read(self, size):
+        return self.stream.read(size)
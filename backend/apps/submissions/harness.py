@@ -0,0 +1,233 @@
+"""
+In-sandbox batch harness.
+
+Copied next to the submission and run *inside* the sandbox as
+`python3 harness.py manifest.json`. Runs the program once per test input, so
+a whole submission is judged in a single sandbox session.
+
+Results are streamed as each case finishes. Every case is one JSON header
+line (stderr, exit code, wall/CPU time, peak memory, which limits were hit
+and `stdout_size`) followed by exactly `stdout_size` raw bytes of the
+program's stdout. Stdout is spooled to a temp file capped with
+RLIMIT_FSIZE, so neither side ever holds more than the output limit.
+
+This file must stay standalone: no Django, stdlib only (plus the libseccomp
+bindings when the manifest asks for a seccomp filter).
+"""
+import argparse
+import errno
+import json
+import math
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import seccomp
+except ImportError:
+    seccomp = None
+
+# Denied when the manifest asks for a seccomp filter
+DENIED_SYSCALLS = (
+    'socket', 'connect', 'bind', 'listen', 'accept', 'accept4',
+    'ptrace', 'process_vm_readv', 'process_vm_writev',
+    'mount', 'umount2', 'pivot_root', 'chroot', 'unshare', 'setns',
+    'kexec_load', 'reboot', 'bpf', 'perf_event_open', 'keyctl',
+)
+
+# Only the head of stderr is reported; it is shown to users, never compared
+STDERR_LIMIT = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# cgroup v2 first, then v1; both expose an oom_kill counter for the container
+OOM_COUNTERS = (
+    '/sys/fs/cgroup/memory.events',
+    '/sys/fs/cgroup/memory/memory.oom_control',
+)
+
+
+def read_oom_kills(cgroup_dir=None):
+    paths = (os.path.join(cgroup_dir, 'memory.events'),) if cgroup_dir else OOM_COUNTERS
+    for path in paths:
+        try:
+            with open(path) as f:
+                for line in f:
+                    name, _, value = line.partition(' ')
+                    if name == 'oom_kill':
+                        return int(value)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def install_seccomp():
+    syscall_filter = seccomp.SyscallFilter(defaction=seccomp.ALLOW)
+    for name in DENIED_SYSCALLS:
+        try:
+            syscall_filter.add_rule(seccomp.ERRNO(errno.EPERM), name)
+        except Exception:
+            # Not every syscall exists on every architecture
+            continue
+    syscall_filter.load()
+
+
+def sandbox_setup(time_limit, output_limit=None, rlimits=None, use_seccomp=False):
+    # Kernel backstop for CPU hogs; the precise check uses the measured rusage
+    seconds = max(1, math.ceil(time_limit))
+
+    def apply():
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+        if output_limit is not None:
+            # One byte of slack, so a file above the limit proves the overrun
+            resource.setrlimit(resource.RLIMIT_FSIZE, (output_limit + 1, output_limit + 1))
+        for name, value in (rlimits or {}).items():
+            resource.setrlimit(getattr(resource, name), (value, value))
+        if use_seccomp:
+            install_seccomp()
+    return apply
+
+
+def run_case(command, input_path, stdout, time_limit, wall_time_limit,
+             memory_limit_kb=None, output_limit=None, options=None):
+    """
+    Run one case with its stdout going to the `stdout` file. `time_limit`
+    is a CPU-time (user + sys) limit; the wall-clock limit only catches
+    programs that block or sleep. `options` carries the optional manifest
+    keys: rlimits, seccomp and cgroup_dir.
+    """
+    options = options or {}
+    cgroup_dir = options.get('cgroup_dir')
+    with open(input_path, 'rb') as stdin, tempfile.TemporaryFile() as stderr:
+        timed_out = threading.Event()
+        oom_before = read_oom_kills(cgroup_dir)
+
+        start = time.monotonic()
+        proc = subprocess.Popen(
+            command,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            preexec_fn=sandbox_setup(time_limit, output_limit, options.get('rlimits'), options.get('seccomp'))
+        )
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(wall_time_limit, kill)
+        timer.start()
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall_time = time.monotonic() - start
+        timer.cancel()
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        cpu_time = rusage.ru_utime + rusage.ru_stime
+        if cpu_time > time_limit or proc.returncode == -signal.SIGXCPU:
+            timed_out.set()
+
+        oom_after = read_oom_kills(cgroup_dir)
+        if oom_before is not None and oom_after is not None:
+            oom_killed = oom_after > oom_before
+        else:
+            # No cgroup accounting visible, an unexplained SIGKILL is the best hint
+            oom_killed = proc.returncode == -9 and not timed_out.is_set()
+        memory_exceeded = oom_killed or (
+            memory_limit_kb is not None and rusage.ru_maxrss > memory_limit_kb
+        )
+
+        stdout_size = os.fstat(stdout.fileno()).st_size
+        output_exceeded = output_limit is not None and (
+            stdout_size > output_limit or proc.returncode == -signal.SIGXFSZ
+        )
+
+        stderr.seek(0)
+        return {
+            'stderr': stderr.read(STDERR_LIMIT).decode(errors='replace'),
+            'exit_code': proc.returncode,
+            'timed_out': timed_out.is_set(),
+            'wall_time': int(wall_time * 1000),
+            'cpu_time': int(cpu_time * 1000),
+            'memory_kb': rusage.ru_maxrss,
+            'memory_exceeded': memory_exceeded,
+            'output_exceeded': output_exceeded,
+        }
+
+
+def emit(result, stdout=None, output_limit=None):
+    """Write one case: its JSON header line, then the (capped) stdout bytes."""
+    size = 0
+    if stdout is not None:
+        size = os.fstat(stdout.fileno()).st_size
+        if output_limit is not None:
+            size = min(size, output_limit)
+        stdout.seek(0)
+    result['stdout_size'] = size
+
+    out = sys.stdout.buffer
+    out.write(json.dumps(result).encode() + b'\n')
+    remaining = size
+    while remaining > 0:
+        chunk = stdout.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        out.write(chunk)
+        remaining -= len(chunk)
+    # The judge consumes cases as they finish
+    out.flush()
+
+
+def main(manifest_path, cgroup_dir=None):
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    options = {
+        'rlimits': manifest.get('rlimits'),
+        'seccomp': manifest.get('seccomp', False),
+        'cgroup_dir': cgroup_dir,
+    }
+    if options['seccomp'] and seccomp is None:
+        # Never run untrusted code without the filter it was promised
+        sys.exit("harness: seccomp was requested but the libseccomp Python bindings are not installed")
+
+    output_limit = manifest.get('output_limit')
+    failed = False
+    for input_path in manifest['inputs']:
+        if failed:
+            emit({'skipped': True})
+            continue
+        with tempfile.TemporaryFile() as stdout:
+            try:
+                result = run_case(
+                    manifest['command'],
+                    input_path,
+                    stdout,
+                    manifest['time_limit'],
+                    manifest['wall_time_limit'],
+                    manifest.get('memory_limit_kb'),
+                    output_limit,
+                    options
+                )
+            except Exception as e:
+                result = {'error': str(e)}
+            emit(result, stdout, output_limit)
+        # Output correctness is judged outside the sandbox, so only crashes,
+        # timeouts and memory or output overruns can stop the batch early
+        if manifest.get('stop_on_failure'):
+            failed = (
+                'error' in result
+                or result['timed_out']
+                or result['memory_exceeded']
+                or result['output_exceeded']
+                or result['exit_code'] != 0
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('manifest')
+    parser.add_argument('--cgroup', default=None)
+    args = parser.parse_args()
+    main(args.manifest, args.cgroup)
@@ -0,0 +1,94 @@
+"""
+Language runtime registry.
+
+Everything the judge needs to know about a language comes from its
+`Language` row: the sandbox image, compile and run command templates,
+time/memory multipliers and whether compiled artifacts are cached. Adding
+a language or tuning its flags is a data change, not a code change.
+
+Each worker process loads the active languages once. Saving or deleting a
+Language bumps a version stamp in the shared cache, and every worker
+reloads its registry the next time it sees a new stamp.
+"""
+import logging
+import threading
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Language
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'language-registry-version'
+
+
+class LanguageRuntime:
+    def __init__(self, language):
+        self.id = language.id
+        self.name = language.name
+        self.version = language.version
+        self.extension = language.file_extension
+        self.image = language.image
+        self.source_filename = language.source_filename
+        self.compile_command = language.compile_command.strip()
+        self.execute_command = language.execute_command.strip()
+        self.cache_artifacts = language.cache_artifacts
+        self.time_multiplier = language.time_multiplier
+        self.memory_multiplier = language.memory_multiplier
+
+    @property
+    def compiled(self):
+        return bool(self.compile_command)
+
+    def __repr__(self):
+        return f"<LanguageRuntime {self.name} {self.version}>"
+
+
+class LanguageRegistry:
+    def __init__(self):
+        self._runtimes = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self):
+        version = cache.get(VERSION_KEY)
+        with self._lock:
+            if self._runtimes is None or version != self._version:
+                self._runtimes = {
+                    language.id: LanguageRuntime(language)
+                    for language in Language.objects.filter(is_active=True)
+                }
+                self._version = version
+                logger.info(f"Loaded {len(self._runtimes)} language runtimes")
+            return self._runtimes
+
+    def get(self, language_id):
+        runtimes = self._ensure_fresh()
+        if language_id in runtimes:
+            return runtimes[language_id]
+        # Deactivated languages still judge the submissions made while they were active
+        return LanguageRuntime(Language.objects.get(id=language_id))
+
+    def by_extension(self, extension):
+        for runtime in self._ensure_fresh().values():
+            if runtime.extension == extension:
+                return runtime
+        raise Language.DoesNotExist(f"No active language for .{extension} files")
+
+    def invalidate(self):
+        with self._lock:
+            self._runtimes = None
+
+
+_registry = LanguageRegistry()
+
+
+def get_language_registry():
+    return _registry
+
+
+def language_changed(**kwargs):
+    """post_save/post_delete handler for Language."""
+    _registry.invalidate()
+    cache.set(VERSION_KEY, uuid4().hex, None)
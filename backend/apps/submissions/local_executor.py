@@ -0,0 +1,169 @@
+import logging
+import os
+from uuid import uuid4
+
+from django.conf import settings
+
+from .base_executor import BaseExecutor
+
+logger = logging.getLogger(__name__)
+
+# Applied by the harness to every test run, on top of the CPU-time limit
+LOCAL_RLIMITS = {
+    "RLIMIT_NOFILE": 64,
+    "RLIMIT_NPROC": 64,
+    "RLIMIT_CORE": 0,
+}
+
+
+def _drop_privileges():
+    """preexec_fn: switch a root worker to the sandbox uid before exec."""
+    if os.geteuid() != 0:
+        return
+    os.setgroups([])
+    os.setgid(settings.LOCAL_SANDBOX_UID)
+    os.setuid(settings.LOCAL_SANDBOX_UID)
+
+
+class LocalExecutor(BaseExecutor):
+    """
+    Runs submissions as local processes, without a container runtime.
+
+    Compilers and harness sessions are started under bubblewrap in fresh
+    user, mount, network, IPC, UTS and PID namespaces. The private mount
+    namespace holds only the read-only system directories in
+    LOCAL_SANDBOX_RO_BINDS, a private /tmp and the submission's own work
+    directory, bound read-only for test runs. The compile cache, test data,
+    other submissions and the project tree are not visible. Processes run
+    as LOCAL_SANDBOX_UID, and a worker running as root also drops to that
+    uid on the host before starting the sandbox.
+
+    Each session is placed in its own cgroup v2 leaf with memory, swap and
+    pid limits; without a cgroup root, RLIMIT_AS caps memory instead. The
+    harness adds rlimits and a seccomp syscall deny-list, and refuses to run
+    when seccomp is enabled but its bindings are missing. Sandbox startup is
+    a fork/exec instead of a docker daemon round-trip, which suits dedicated
+    judge hosts and CI machines without Docker.
+    """
+    def _toolchain_id(self):
+        # Language images are not used; compilers come from the host
+        return "local"
+
+    def _make_temp_dir(self):
+        temp_dir = super()._make_temp_dir()
+        if os.geteuid() == 0:
+            # The sandbox uid writes the compiled artifact here
+            os.chown(temp_dir, settings.LOCAL_SANDBOX_UID, settings.LOCAL_SANDBOX_UID)
+        return temp_dir
+
+    def _sandbox_command(self, writable=False, cgroup=None):
+        """bubblewrap prefix that sees only system directories and the work directory."""
+        uid = str(settings.LOCAL_SANDBOX_UID)
+        command = [
+            settings.LOCAL_SANDBOX_BWRAP,
+            "--unshare-all", "--unshare-user", "--die-with-parent", "--new-session",
+            "--uid", uid, "--gid", uid,
+            "--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp",
+        ]
+        for path in settings.LOCAL_SANDBOX_RO_BINDS:
+            command += ["--ro-bind-try", path, path]
+        command += ["--bind" if writable else "--ro-bind", self.temp_dir, self.temp_dir]
+        if cgroup is not None:
+            command += ["--ro-bind", cgroup, cgroup]
+        return command + ["--chdir", self.temp_dir, "--"]
+
+    def _compile_command(self, command):
+        return self._sandbox_command(writable=True) + command
+
+    def _compile_popen_kwargs(self):
+        return {"preexec_fn": _drop_privileges}
+
+    def _manifest_options(self, cpuset=None):
+        rlimits = dict(LOCAL_RLIMITS)
+        if not settings.LOCAL_SANDBOX_CGROUP_ROOT:
+            # No cgroup memory limit, so cap the address space instead
+            rlimits["RLIMIT_AS"] = self.sandbox_memory_mb * 1024 * 1024
+        return {
+            "rlimits": rlimits,
+            "seccomp": settings.LOCAL_SANDBOX_SECCOMP,
+        }
+
+    def _create_cgroup(self, cpuset=None):
+        root = settings.LOCAL_SANDBOX_CGROUP_ROOT
+        if not root:
+            return None
+
+        path = os.path.join(root, f"judge-{uuid4().hex[:12]}")
+        try:
+            os.mkdir(path)
+            limits = {
+                "memory.max": str(self.sandbox_memory_mb * 1024 * 1024),
+                "memory.swap.max": "0",
+                "pids.max": "64",
+            }
+            if cpuset is not None:
+                limits["cpuset.cpus"] = str(cpuset)
+            for name, value in limits.items():
+                with open(os.path.join(path, name), "w") as f:
+                    f.write(value)
+        except OSError as e:
+            # Running on without the memory limit would be worse than failing
+            self._remove_cgroup(path)
+            raise RuntimeError(f"Could not set up cgroup {path}: {e}") from e
+        return path
+
+    def _remove_cgroup(self, path):
+        if path is None or not os.path.isdir(path):
+            return
+        try:
+            # Kill anything the session left behind before removing the leaf
+            with open(os.path.join(path, "cgroup.kill"), "w") as f:
+                f.write("1")
+        except OSError:
+            pass
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            logger.warning(f"Failed to remove cgroup {path}: {e}")
+
+    def _session_command(self, harness_command, cgroup):
+        """Return (command, preexec_fn) for a harness session in `cgroup`."""
+        def enter_cgroup():
+            if cgroup is not None:
+                with open(os.path.join(cgroup, "cgroup.procs"), "w") as f:
+                    f.write(str(os.getpid()))
+            _drop_privileges()
+
+        command = self._sandbox_command(cgroup=cgroup) + harness_command
+        if cgroup is not None:
+            # The harness reads the OOM counter of this session's own cgroup
+            command += ["--cgroup", cgroup]
+        return command, enter_cgroup
+
+    def _run_session(self, harness_command, timeout, reader, cpuset=None):
+        cgroup = self._create_cgroup(cpuset)
+        command, enter_cgroup = self._session_command(harness_command, cgroup)
+        try:
+            return self._stream_harness(
+                command,
+                timeout,
+                reader,
+                cwd=self.temp_dir,
+                preexec_fn=enter_cgroup
+            )
+        finally:
+            self._remove_cgroup(cgroup)
+
+    async def _run_session_async(self, harness_command, timeout, reader, cpuset=None):
+        cgroup = self._create_cgroup(cpuset)
+        command, enter_cgroup = self._session_command(harness_command, cgroup)
+        try:
+            return await self._stream_harness_async(
+                command,
+                timeout,
+                reader,
+                cwd=self.temp_dir,
+                preexec_fn=enter_cgroup
+            )
+        finally:
+            self._remove_cgroup(cgroup)
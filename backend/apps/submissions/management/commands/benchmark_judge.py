@@ -0,0 +1,159 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from apps.problems.models import Problem
+from apps.submissions import benchmark
+from apps.submissions.fake_executor import FakeExecutor
+from apps.submissions.models import Language
+from apps.submissions.services import CodeExecutionService
+
+FAKE_EXECUTOR = 'apps.submissions.fake_executor.FakeExecutor'
+
+
+class Command(BaseCommand):
+    help = 'Measure judge throughput and latency on synthetic problems and submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--executor', default=None,
+            help=f'Executor backend to judge with (default: JUDGE_EXECUTOR_BACKEND; "fake" for {FAKE_EXECUTOR})'
+        )
+        parser.add_argument('--fake-compile-ms', type=float, default=0, help='Simulated compile time of the fake executor')
+        parser.add_argument('--fake-run-ms', type=float, default=0, help='Simulated time per test run of the fake executor')
+        parser.add_argument(
+            '--problems', default='1x10,10x1000,20x100000',
+            help='Comma-separated problems as <test cases>x<numbers per test>'
+        )
+        parser.add_argument('--languages', default='py,cpp', help='File extensions of the languages to submit in')
+        parser.add_argument(
+            '--kinds', default=','.join(benchmark.SOLUTIONS['py']),
+            help='Solutions to submit: ACCEPTED, WRONG_ANSWER, TIME_LIMIT_EXCEEDED, COMPILATION_ERROR'
+        )
+        parser.add_argument('--repeat', type=int, default=2, help='Rounds of every problem x language x solution')
+        parser.add_argument('--concurrency', type=int, default=1, help='Submissions judged at once')
+        parser.add_argument('--policy', default='FAIL_FAST', choices=[c[0] for c in Problem.JUDGING_POLICY_CHOICES])
+        parser.add_argument('--same-code', action='store_true', help='Submit identical code, so compile caches hit')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark problems and submissions')
+        parser.add_argument('--json', dest='json_path', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        executor = options['executor'] or settings.JUDGE_EXECUTOR_BACKEND
+        if executor == 'fake':
+            executor = FAKE_EXECUTOR
+        executor_class = import_string(executor)
+        if issubclass(executor_class, FakeExecutor):
+            executor_class.compile_delay_sec = options['fake_compile_ms'] / 1000
+            executor_class.run_delay_sec = options['fake_run_ms'] / 1000
+
+        kinds = [kind.strip().upper() for kind in options['kinds'].split(',')]
+        extensions = [extension.strip() for extension in options['languages'].split(',')]
+        for extension in extensions:
+            if extension not in benchmark.SOLUTIONS:
+                raise CommandError(f"No benchmark solutions for .{extension}")
+            unknown = set(kinds) - set(benchmark.SOLUTIONS[extension])
+            if unknown:
+                raise CommandError(f"Unknown solution kinds: {', '.join(sorted(unknown))}")
+        try:
+            specs = benchmark.parse_problem_specs(options['problems'])
+            languages = benchmark.get_languages(extensions)
+        except (ValueError, Language.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        user = benchmark.get_benchmark_user()
+        problems = benchmark.create_problems(user, specs, options['policy'], options['seed'])
+        try:
+            workload = benchmark.build_workload(
+                user, problems, languages, kinds, options['repeat'], not options['same_code'], options['seed']
+            )
+            self.stdout.write(f"Judging {len(workload)} submissions with {executor}, concurrency {options['concurrency']}")
+            with override_settings(JUDGE_EXECUTOR_BACKEND=executor):
+                report = self._run(workload, options['concurrency'])
+        finally:
+            if not options['keep']:
+                Problem.objects.filter(id__in=[problem.id for problem in problems]).delete()
+
+        report.update(executor=executor, concurrency=options['concurrency'], problems=options['problems'])
+        self._print(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def _run(self, workload, concurrency):
+        queries = benchmark.QueryCounter()
+
+        def judge(item):
+            submission, expected = item
+            start = time.perf_counter()
+            with connection.execute_wrapper(queries):
+                CodeExecutionService.execute_code(submission)
+            return submission, expected, time.perf_counter() - start
+
+        with benchmark.StageTimer().installed() as timer:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(judge, workload))
+            wall_time = time.perf_counter() - start
+
+        latencies = [elapsed for _, _, elapsed in outcomes]
+        unexpected = [
+            {'submission': submission.id, 'expected': expected, 'got': submission.status}
+            for submission, expected, _ in outcomes
+            if submission.status != expected
+        ]
+        return {
+            'submissions': len(outcomes),
+            'wall_time_sec': wall_time,
+            'submissions_per_sec': len(outcomes) / wall_time if wall_time else 0,
+            'latency_ms': {
+                'p50': benchmark.percentile(latencies, 0.50) * 1000,
+                'p95': benchmark.percentile(latencies, 0.95) * 1000,
+                'p99': benchmark.percentile(latencies, 0.99) * 1000,
+                'max': max(latencies) * 1000,
+            },
+            'stages_sec': dict(timer.totals),
+            'db': {
+                'queries_per_submission': queries.queries / len(outcomes),
+                'ms_per_submission': queries.seconds / len(outcomes) * 1000,
+            },
+            'unexpected_verdicts': unexpected,
+        }
+
+    def _print(self, report):
+        count = report['submissions']
+        self.stdout.write(
+            f"\n{count} submissions in {report['wall_time_sec']:.2f}s: "
+            f"{report['submissions_per_sec']:.2f} submissions/sec"
+        )
+        latency = report['latency_ms']
+        self.stdout.write(
+            f"Latency: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+            f"p99 {latency['p99']:.1f} ms, max {latency['max']:.1f} ms"
+        )
+
+        db = report['db']
+        self.stdout.write(
+            f"Database: {db['queries_per_submission']:.1f} queries, "
+            f"{db['ms_per_submission']:.2f} ms per submission"
+        )
+
+        stages = report['stages_sec']
+        total = sum(stages.values()) or 1
+        self.stdout.write(f"\n{'Stage':<12}{'total s':>10}{'per sub ms':>12}{'share':>8}")
+        for _, _, stage in benchmark.STAGES:
+            seconds = stages.get(stage, 0.0)
+            self.stdout.write(f"{stage:<12}{seconds:>10.3f}{seconds / count * 1000:>12.2f}{seconds / total:>8.1%}")
+
+        if report['unexpected_verdicts']:
+            self.stdout.write(self.style.WARNING(f"\n{len(report['unexpected_verdicts'])} unexpected verdicts:"))
+            for entry in report['unexpected_verdicts'][:20]:
+                self.stdout.write(f"  submission {entry['submission']}: expected {entry['expected']}, got {entry['got']}")
+        else:
+            self.stdout.write(self.style.SUCCESS("\nAll verdicts as expected"))
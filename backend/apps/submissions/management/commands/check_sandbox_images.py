@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.submissions.docker_executor import check_language_images
+
+
+class Command(BaseCommand):
+    help = 'Check that the judge harness starts in the Docker image of every active language'
+
+    def handle(self, *args, **options):
+        results = check_language_images()
+        failed = 0
+        for image, (names, error) in results.items():
+            if error is None:
+                self.stdout.write(self.style.SUCCESS(f"{image} ({', '.join(names)}): ok"))
+            else:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{image} ({', '.join(names)}): {error}"))
+        if failed:
+            raise CommandError(f"The harness cannot run in {failed} of {len(results)} images")
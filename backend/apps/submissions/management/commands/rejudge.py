@@ -0,0 +1,91 @@
+import argparse
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+from apps.problems.models import Problem
+from apps.submissions import rejudge
+from apps.submissions.models import Language, Rejudge, Submission
+
+
+def _datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise argparse.ArgumentTypeError(f"not a date or date and time: {value}")
+        parsed = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Rejudge submissions in throttled, low-priority batches, or manage running rejudges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', help='Problem slug')
+        parser.add_argument('--language', help='Language file extension, e.g. py')
+        parser.add_argument(
+            '--status', action='append', default=[],
+            choices=[status for status, _ in Submission.STATUS_CHOICES],
+            help='Only submissions with this verdict; may be repeated'
+        )
+        parser.add_argument('--since', type=_datetime, help='Submitted at or after this date (and time)')
+        parser.add_argument('--until', type=_datetime, help='Submitted before this date (and time)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the submissions that would be rejudged')
+        parser.add_argument('--list', action='store_true', help='Show rejudges and their progress')
+        parser.add_argument('--pause', type=int, metavar='ID', help='Stop queuing for a rejudge')
+        parser.add_argument('--resume', type=int, metavar='ID', help='Continue a paused or stalled rejudge')
+        parser.add_argument('--cancel', type=int, metavar='ID', help='Stop a rejudge for good')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self._list()
+        for action in ('pause', 'resume', 'cancel'):
+            if options[action] is not None:
+                try:
+                    job = Rejudge.objects.get(id=options[action])
+                except Rejudge.DoesNotExist:
+                    raise CommandError(f"No rejudge {options[action]}")
+                getattr(rejudge, action)(job)
+                job.refresh_from_db()
+                self.stdout.write(f"Rejudge {job.id}: {job.status}")
+                return
+
+        filters = {
+            'statuses': options['status'],
+            'submitted_after': options['since'],
+            'submitted_before': options['until'],
+        }
+        try:
+            if options['problem']:
+                filters['problem'] = Problem.objects.get(slug=options['problem'])
+            if options['language']:
+                filters['language'] = Language.objects.get(file_extension=options['language'])
+        except (Problem.DoesNotExist, Language.DoesNotExist) as e:
+            raise CommandError(str(e))
+        except Language.MultipleObjectsReturned:
+            raise CommandError(f"Several languages use .{options['language']}; rejudge them from the admin")
+        if not options['problem'] and not options['language'] and not options['status']:
+            raise CommandError("Select submissions with --problem, --language or --status")
+
+        if options['dry_run']:
+            count = rejudge.selection(Rejudge(created_at=timezone.now(), **filters)).count()
+            self.stdout.write(f"{count} submissions would be rejudged")
+            return
+
+        job = rejudge.start_rejudge(**filters)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rejudge {job.id} started for {job.total} submissions; follow it with --list"
+        ))
+
+    def _list(self):
+        for job in Rejudge.objects.order_by('-created_at')[:20]:
+            counts = rejudge.progress(job)
+            self.stdout.write(
+                f"{job.id:>5}  {job.status:<10} {counts['judged']}/{counts['total']} judged, "
+                f"{counts['in_flight']} judging  (created {job.created_at:%Y-%m-%d %H:%M})"
+            )
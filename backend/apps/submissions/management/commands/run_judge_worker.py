@@ -0,0 +1,36 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.submissions.async_worker import AsyncJudgeWorker
+
+
+class Command(BaseCommand):
+    help = 'Judge pending submissions concurrently from one asyncio process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-submissions', type=int, default=settings.JUDGE_ASYNC_MAX_SUBMISSIONS,
+            help='Submissions judged at once; sandbox sessions are further bounded by the CPU/memory budget'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.JUDGE_ASYNC_POLL_INTERVAL,
+            help='Seconds between checks for new pending submissions'
+        )
+
+    def handle(self, *args, **options):
+        if settings.JUDGE_WORKER != 'async':
+            self.stdout.write(self.style.WARNING(
+                "JUDGE_WORKER is not 'async', so submissions are also queued to Celery"
+            ))
+        self.stdout.write(
+            f"Judging up to {options['max_submissions']} submissions at once on "
+            f"{settings.JUDGE_CPU_BUDGET} CPUs and {settings.JUDGE_MEMORY_BUDGET_MB} MB"
+        )
+        worker = AsyncJudgeWorker(
+            max_submissions=options['max_submissions'],
+            poll_interval=options['poll_interval']
+        )
+        asyncio.run(worker.run())
+        self.stdout.write(self.style.SUCCESS('Judge worker stopped'))
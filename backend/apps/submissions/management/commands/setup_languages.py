@@ -10,6 +10,7 @@ class Command(BaseCommand):
                 'name': 'Python',
                 'version': '3.10.0',
                 'file_extension': 'py',
+                'image': 'python:3.10-slim',
                 'compile_command': '',
                 'execute_command': 'python3 {file}',
                 'time_multiplier': 3.0,
@@ -19,8 +20,12 @@ class Command(BaseCommand):
                 'name': 'Java',
                 'version': '15.0.2',
                 'file_extension': 'java',
-                'compile_command': 'javac {file}',
-                'execute_command': 'java {class}',
+                # Built from sandbox_images/java.Dockerfile: the JDK images have no python3 for the harness
+                'image': 'coding-platform/java:17',
+                'source_filename': 'Main.java',
+                # Classes are packed into one jar so the build is a single cacheable file
+                'compile_command': 'sh -c "javac -d {dir}/classes {file} && jar cfe {executable} {class} -C {dir}/classes ."',
+                'execute_command': 'java -Xss64m -jar {executable}',
                 'time_multiplier': 2.0,
                 'memory_multiplier': 2.5,
             },
@@ -28,8 +33,9 @@ class Command(BaseCommand):
                 'name': 'C++',
                 'version': '10.2.0',
                 'file_extension': 'cpp',
-                'compile_command': 'g++ -o {executable} {file}',
-                'execute_command': './{executable}',
+                'image': 'gcc:latest',
+                'compile_command': 'g++ -std=c++17 -Wall -O2 -g -o {executable} {file}',
+                'execute_command': '{executable}',
                 'time_multiplier': 1.0,
                 'memory_multiplier': 1.0,
             },
@@ -37,8 +43,9 @@ class Command(BaseCommand):
                 'name': 'C',
                 'version': '10.2.0',
                 'file_extension': 'c',
-                'compile_command': 'gcc -o {executable} {file}',
-                'execute_command': './{executable}',
+                'image': 'gcc:latest',
+                'compile_command': 'gcc -std=c11 -Wall -O2 -o {executable} {file} -lm',
+                'execute_command': '{executable}',
                 'time_multiplier': 1.0,
                 'memory_multiplier': 1.0,
             },
@@ -46,6 +53,7 @@ class Command(BaseCommand):
                 'name': 'JavaScript',
                 'version': '18.15.0',
                 'file_extension': 'js',
+                'image': 'node:18',
                 'compile_command': '',
                 'execute_command': 'node {file}',
                 'time_multiplier': 2.5,
@@ -55,8 +63,10 @@ class Command(BaseCommand):
                 'name': 'Go',
                 'version': '1.16.2',
                 'file_extension': 'go',
-                'compile_command': 'go build {file}',
-                'execute_command': './{executable}',
+                # Built from sandbox_images/go.Dockerfile, for the same reason
+                'image': 'coding-platform/go:1.16',
+                'compile_command': 'go build -o {executable} {file}',
+                'execute_command': '{executable}',
                 'time_multiplier': 1.5,
                 'memory_multiplier': 1.5,
             },
@@ -64,8 +74,9 @@ class Command(BaseCommand):
                 'name': 'Rust',
                 'version': '1.68.2',
                 'file_extension': 'rs',
-                'compile_command': 'rustc {file}',
-                'execute_command': './{executable}',
+                'image': 'rust:1.68',
+                'compile_command': 'rustc -O -o {executable} {file}',
+                'execute_command': '{executable}',
                 'time_multiplier': 1.2,
                 'memory_multiplier': 1.3,
             },
@@ -0,0 +1,168 @@
+"""
+Judge metrics in the Prometheus text format.
+
+Submissions are judged in Celery worker processes but scraped from the web
+process, so observations are aggregated in one Redis hash shared by all of
+them. Each observation is a single pipelined round of HINCRBYFLOATs. Only
+the bucket a value falls in is incremented, and buckets are made
+cumulative when rendering. Without a django-redis cache (development),
+metrics are kept per process.
+
+Exported series:
+
+    judge_submissions_total{language, verdict}
+    judge_stage_duration_seconds{stage, language, verdict}   (histogram)
+    judge_test_run_seconds{language}                          (histogram)
+
+Stages are queue_wait (submitted_at to judging start), compile, run,
+check and persist. They are also stored on Submission.stage_timings.
+
+Gauges of the current state (e.g. fair queue depth) are read when scraped
+and rendered with render_gauge().
+"""
+import json
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+HASH_KEY = 'judge-metrics'
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+TEST_RUN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    'judge_submissions_total': ('counter', 'Judged submissions by language and verdict.', None),
+    'judge_stage_duration_seconds': ('histogram', 'Time spent in each judge stage per submission.', STAGE_BUCKETS),
+    'judge_test_run_seconds': ('histogram', 'Wall time of individual test case runs.', TEST_RUN_BUCKETS),
+}
+
+
+def _field(name, **labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def add_timing(timings, stage, seconds):
+    """Add `seconds` to a stage of a timings dict, which may be None."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def round_timings(timings):
+    # Milliseconds are plenty for storing on a submission
+    return {stage: round(seconds, 3) for stage, seconds in timings.items()}
+
+
+class JudgeMetrics:
+    def __init__(self):
+        self._local = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection('default')
+        except (ImportError, NotImplementedError):
+            return None
+
+    def _observe(self, updates, name, value, **labels):
+        buckets = METRICS[name][2]
+        le = next((str(bound) for bound in buckets if value <= bound), '+Inf')
+        updates[_field(f'{name}_bucket', le=le, **labels)] += 1
+        updates[_field(f'{name}_sum', **labels)] += value
+        updates[_field(f'{name}_count', **labels)] += 1
+
+    def observe_submission(self, language, verdict, timings, test_run_seconds=()):
+        """Record one judged submission: its stage timings and per-test run times."""
+        updates = defaultdict(float)
+        updates[_field('judge_submissions_total', language=language, verdict=verdict)] += 1
+        for stage, seconds in timings.items():
+            self._observe(updates, 'judge_stage_duration_seconds', seconds, stage=stage, language=language, verdict=verdict)
+        for seconds in test_run_seconds:
+            self._observe(updates, 'judge_test_run_seconds', seconds, language=language)
+        self._apply(updates)
+
+    def _apply(self, updates):
+        connection = self._connection()
+        if connection is None:
+            with self._lock:
+                for field, value in updates.items():
+                    self._local[field] += value
+            return
+        try:
+            pipeline = connection.pipeline(transaction=False)
+            for field, value in updates.items():
+                pipeline.hincrbyfloat(HASH_KEY, field, value)
+            pipeline.execute()
+        except Exception as e:
+            # Metrics must never fail judging
+            logger.warning(f"Failed to record judge metrics: {e}")
+
+    def collect(self):
+        connection = self._connection()
+        if connection is None:
+            with self._lock:
+                return dict(self._local)
+        return {
+            field.decode(): float(value)
+            for field, value in connection.hgetall(HASH_KEY).items()
+        }
+
+    def render(self):
+        """All series in the Prometheus text exposition format."""
+        series = defaultdict(dict)
+        for field, value in self.collect().items():
+            name, labels = json.loads(field)
+            series[name][tuple(tuple(label) for label in labels)] = value
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for labels, value in sorted(series[name].items()):
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+
+            counts = defaultdict(dict)
+            for labels, value in series[f'{name}_bucket'].items():
+                le = dict(labels)['le']
+                counts[tuple(label for label in labels if label[0] != 'le')][le] = value
+            for labels in sorted(series[f'{name}_count']):
+                cumulative = 0
+                for bound in [str(bound) for bound in buckets] + ['+Inf']:
+                    cumulative += counts[labels].get(bound, 0)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {_format_value(cumulative)}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(series[f"{name}_sum"][labels])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {_format_value(series[f"{name}_count"][labels])}')
+        return '\n'.join(lines) + '\n'
+
+
+def render_gauge(name, help_text, values):
+    """A gauge in the Prometheus text format, from {labels tuple: value}."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+    for labels, value in sorted(values.items()):
+        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+_metrics = JudgeMetrics()
+
+
+def get_judge_metrics():
+    return _metrics
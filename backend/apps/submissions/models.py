@@ -1,21 +1,62 @@
+from uuid import uuid4
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from apps.problems.models import Problem, TestCase
 
 User = get_user_model()
 
+def new_driver_id():
+    return uuid4().hex
+
 class Language(models.Model):
     name = models.CharField(max_length=50)
     version = models.CharField(max_length=20)
     file_extension = models.CharField(max_length=10)
+    # Sandbox image the program is compiled and run in; it must provide python3 for the judge harness
+    image = models.CharField(max_length=200, blank=True)
+    # Fixed source file name for languages that need one (e.g. Main.java), otherwise random
+    source_filename = models.CharField(max_length=100, blank=True)
+    # Command templates with {file}, {executable}, {dir} and {class} placeholders.
+    # Compiling must produce the single file {executable}.
     compile_command = models.TextField(blank=True)
     execute_command = models.TextField()
+    # Keep compiled programs in the content-addressed compile cache
+    cache_artifacts = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
     time_multiplier = models.FloatField(default=1.0)
     memory_multiplier = models.FloatField(default=1.0)
 
     judge0_id = models.IntegerField(null=True, blank=True)
 
+class Rejudge(models.Model):
+    """A bulk rejudge, queued in throttled batches by rejudge.advance()."""
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('PAUSED', 'Paused'),
+        ('COMPLETED', 'Completed'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # Selection: submissions matching every filter that is set, submitted before the rejudge was created
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, null=True, blank=True)
+    language = models.ForeignKey(Language, on_delete=models.CASCADE, null=True, blank=True)
+    statuses = models.JSONField(default=list, blank=True)
+    submitted_after = models.DateTimeField(null=True, blank=True)
+    submitted_before = models.DateTimeField(null=True, blank=True)
+    submission_ids = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RUNNING')
+    total = models.IntegerField(default=0)
+    queued = models.IntegerField(default=0)
+    # Submissions are queued in id order; a resumed rejudge carries on after this id
+    cursor = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Only the rejudge_task chain carrying this id advances the rejudge
+    driver = models.CharField(max_length=32, default=new_driver_id, editable=False)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
 class Submission(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -24,8 +65,10 @@ class Submission(models.Model):
         ('WRONG_ANSWER', 'Wrong Answer'),
         ('TIME_LIMIT_EXCEEDED', 'Time Limit Exceeded'),
         ('MEMORY_LIMIT_EXCEEDED', 'Memory Limit Exceeded'),
+        ('OUTPUT_LIMIT_EXCEEDED', 'Output Limit Exceeded'),
         ('COMPILATION_ERROR', 'Compilation Error'),
         ('RUNTIME_ERROR', 'Runtime Error'),
+        ('JUDGE_ERROR', 'Judge Error'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -43,12 +86,19 @@ class Submission(models.Model):
     judged_at = models.DateTimeField(null=True, blank=True)
     is_best_submission = models.BooleanField(default=False)
     output = models.TextField(blank=True, null=True)
+    # Seconds per judge stage (queue_wait, compile, run, check, persist), for capacity planning
+    stage_timings = models.JSONField(default=dict, blank=True)
+    # Per-test status, times and memory packed by packed_results; failing cases also have TestCaseResult rows
+    result_data = models.BinaryField(null=True, blank=True, editable=False)
+    # Last bulk rejudge that queued this submission
+    rejudge = models.ForeignKey(Rejudge, on_delete=models.SET_NULL, null=True, blank=True, related_name='submissions')
 
 class TestCaseResult(models.Model):
     submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='test_results')
     test_case = models.ForeignKey(TestCase, on_delete=models.CASCADE)
     status = models.CharField(max_length=30)
-    execution_time = models.IntegerField(default=0)
+    execution_time = models.IntegerField(default=0)  # CPU milliseconds
+    wall_time = models.IntegerField(default=0)  # milliseconds
     memory_used = models.FloatField(default=0)
     output = models.TextField()
     error_message = models.TextField(blank=True)
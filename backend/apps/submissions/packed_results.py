@@ -0,0 +1,107 @@
+"""
+Compact per-submission test results.
+
+The outcome of every test case of a submission (status, CPU time, wall
+time, memory) is packed into columnar arrays stored in one compressed
+blob, Submission.result_data. TestCaseResult rows are only written for
+the failing cases someone will actually read, with their output and error
+message capped. Accepted and skipped cases cost a few bytes each instead of
+a row plus index entries. A compile error is stored once, as the
+submission's error_message, rather than once per test case.
+
+Layout before compression, all little-endian:
+
+    u8 version, u32 count,
+    count x u64 test case id, count x u8 status code,
+    count x u32 CPU ms, count x u32 wall ms, count x u32 memory KB
+
+Version 1 blobs, written before test case ids could outgrow 32 bits,
+store the ids as u32 and are still read.
+"""
+import struct
+import zlib
+
+FORMAT_VERSION = 2
+
+# Column types per format version: id, status, CPU, wall, memory
+COLUMN_CODES = {
+    1: ('I', 'B', 'I', 'I', 'I'),
+    2: ('Q', 'B', 'I', 'I', 'I'),
+}
+
+# Append only: codes are stored, so existing entries must never move
+STATUS_CODES = (
+    'ACCEPTED',
+    'WRONG_ANSWER',
+    'TIME_LIMIT_EXCEEDED',
+    'MEMORY_LIMIT_EXCEEDED',
+    'OUTPUT_LIMIT_EXCEEDED',
+    'RUNTIME_ERROR',
+    'COMPILATION_ERROR',
+    'SKIPPED',
+)
+
+# Cases whose output and error message are worth a TestCaseResult row
+DETAILED_STATUSES = {
+    'WRONG_ANSWER',
+    'TIME_LIMIT_EXCEEDED',
+    'MEMORY_LIMIT_EXCEEDED',
+    'OUTPUT_LIMIT_EXCEEDED',
+    'RUNTIME_ERROR',
+}
+
+UINT32_MAX = 2 ** 32 - 1
+
+
+def _uint32(value):
+    return min(max(int(value), 0), UINT32_MAX)
+
+
+def pack_results(entries):
+    """
+    Pack (test_case_id, status, execution_time_ms, wall_time_ms, memory_mb)
+    tuples into a result_data blob.
+    """
+    count = len(entries)
+    ids, statuses, cpu, wall, memory = zip(*entries) if entries else ((),) * 5
+    data = b''.join((
+        struct.pack('<BI', FORMAT_VERSION, count),
+        struct.pack(f'<{count}Q', *ids),
+        struct.pack(f'<{count}B', *(STATUS_CODES.index(status) for status in statuses)),
+        struct.pack(f'<{count}I', *map(_uint32, cpu)),
+        struct.pack(f'<{count}I', *map(_uint32, wall)),
+        struct.pack(f'<{count}I', *(_uint32(round(mb * 1024)) for mb in memory)),
+    ))
+    return zlib.compress(data)
+
+
+def unpack_results(blob):
+    """Decode a result_data blob into one dict per test case, in judging order."""
+    data = zlib.decompress(blob)
+    version, count = struct.unpack_from('<BI', data)
+    if version not in COLUMN_CODES:
+        raise ValueError(f"Unknown packed result format {version}")
+
+    offset = struct.calcsize('<BI')
+    columns = []
+    for code in COLUMN_CODES[version]:
+        fmt = f'<{count}{code}'
+        columns.append(struct.unpack_from(fmt, data, offset))
+        offset += struct.calcsize(fmt)
+
+    return [
+        {
+            'test_case': test_case,
+            'status': STATUS_CODES[status],
+            'execution_time': execution_time,
+            'wall_time': wall_time,
+            'memory_used': round(memory_kb / 1024, 2),
+        }
+        for test_case, status, execution_time, wall_time, memory_kb in zip(*columns)
+    ]
+
+
+def cap_text(text, size):
+    if len(text) <= size:
+        return text
+    return text[:size] + "\n... (truncated)"
@@ -0,0 +1,116 @@
+"""
+Submission rate limiting at the submit endpoint.
+
+Each user has a token bucket, and a smaller one per problem. A submission
+takes one token from both. Buckets refill continuously, at
+SUBMIT_USER_PER_MINUTE and SUBMIT_PROBLEM_PER_MINUTE, up to their burst
+size. Both buckets are checked and charged in one Lua script on the
+django-redis connection, so concurrent requests from web processes cannot
+overdraw them. A rejected request is told how long until a token is back,
+for the Retry-After header.
+
+Identical code for the same problem and language within
+SUBMIT_DUPLICATE_WINDOW seconds is not judged again. The earlier
+submission is returned instead, which also absorbs double clicks. This
+check costs no tokens.
+
+Without a django-redis cache (development) nothing is limited.
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .verdict_memo import normalize_code
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one bucket per key. ARGV: now, then capacity and refill rate (tokens/second) per key.
+# Returns {1, 0} when a token was taken from every bucket, else {0, seconds until all have one}.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return {1, '0'}
+"""
+
+
+def _connection():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def take_submission_token(user_id, problem_id):
+    """
+    Charge a submission to the user's buckets. Returns 0 if it is allowed,
+    otherwise the seconds to wait before submitting again.
+    """
+    connection = _connection()
+    if connection is None:
+        return 0
+    buckets = (
+        (f"submit-rate:user:{user_id}", settings.SUBMIT_USER_BURST, settings.SUBMIT_USER_PER_MINUTE),
+        (f"submit-rate:problem:{user_id}:{problem_id}", settings.SUBMIT_PROBLEM_BURST, settings.SUBMIT_PROBLEM_PER_MINUTE),
+    )
+    args = [time.time()]
+    for _, burst, per_minute in buckets:
+        args += [burst, per_minute / 60]
+    try:
+        allowed, wait = connection.register_script(TOKEN_BUCKET_SCRIPT)(
+            keys=[key for key, _, _ in buckets], args=args
+        )
+    except Exception as e:
+        # A Redis outage must not take submitting down with it
+        logger.warning(f"Submission rate limiter unavailable: {e}")
+        return 0
+    return 0 if int(allowed) else float(wait)
+
+
+def duplicate_key(user_id, problem_id, language_id, code):
+    digest = hashlib.sha256(normalize_code(code).encode()).hexdigest()
+    return f"submit-dedupe:{user_id}:{problem_id}:{language_id}:{digest}"
+
+
+def claim_submission(key):
+    """
+    Claim a duplicate key for a new submission. Returns None if the code is
+    new, otherwise the id of the submission it duplicates (0 while that one
+    is still being created).
+    """
+    if cache.add(key, 0, settings.SUBMIT_DUPLICATE_WINDOW):
+        return None
+    return cache.get(key, 0)
+
+
+def record_submission(key, submission_id):
+    cache.set(key, submission_id, settings.SUBMIT_DUPLICATE_WINDOW)
+
+
+def release_submission(key):
+    cache.delete(key)
@@ -0,0 +1,151 @@
+"""
+Bulk rejudging, e.g. after a problem's test cases were fixed.
+
+A Rejudge selects submissions by problem, language, status, date range or
+explicit ids. It does not queue them all at once. rejudge_task calls
+advance() every REJUDGE_INTERVAL seconds. Each call queues the next batch
+in id order, holding back while REJUDGE_MAX_IN_FLIGHT of them are still
+pending or running. Batches join the rejudge's own low-weight flow in the
+fair queue, so a rejudge uses the judge workers live users leave idle and
+never more than a small share while they wait. The position
+is kept in Rejudge.cursor, so a paused or interrupted rejudge resumes
+where it stopped. Builds come from the compile cache, so resubmitted code
+that was already compiled is not compiled again.
+"""
+import logging
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import fair_queue
+from .models import Rejudge, Submission
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_STATUSES = ('PENDING', 'RUNNING')
+
+
+def selection(rejudge):
+    """Every submission a rejudge covers, queued or not."""
+    submissions = Submission.objects.filter(submitted_at__lte=rejudge.created_at)
+    if rejudge.problem_id:
+        submissions = submissions.filter(problem_id=rejudge.problem_id)
+    if rejudge.language_id:
+        submissions = submissions.filter(language_id=rejudge.language_id)
+    if rejudge.statuses:
+        submissions = submissions.filter(status__in=rejudge.statuses)
+    if rejudge.submitted_after:
+        submissions = submissions.filter(submitted_at__gte=rejudge.submitted_after)
+    if rejudge.submitted_before:
+        submissions = submissions.filter(submitted_at__lt=rejudge.submitted_before)
+    if rejudge.submission_ids is not None:
+        submissions = submissions.filter(id__in=rejudge.submission_ids)
+    return submissions
+
+
+def progress(rejudge):
+    """Counts for showing how far a rejudge got."""
+    in_flight = rejudge.submissions.filter(status__in=IN_FLIGHT_STATUSES).count()
+    return {
+        'total': rejudge.total,
+        'queued': rejudge.queued,
+        'in_flight': in_flight,
+        'judged': rejudge.queued - in_flight,
+    }
+
+
+def _schedule(rejudge):
+    from .tasks import rejudge_task
+    transaction.on_commit(lambda: rejudge_task.apply_async((rejudge.id, rejudge.driver)))
+
+
+def start_rejudge(created_by=None, **filters):
+    """
+    Create a rejudge of the submissions matching `filters` (problem,
+    language, statuses, submitted_after, submitted_before, submission_ids)
+    and start queuing them.
+    """
+    with transaction.atomic():
+        rejudge = Rejudge.objects.create(created_by=created_by, **filters)
+        launch(rejudge)
+    return rejudge
+
+
+def launch(rejudge):
+    """Count the selection of a newly saved rejudge and start queuing it."""
+    rejudge.total = selection(rejudge).count()
+    rejudge.save(update_fields=['total'])
+    _schedule(rejudge)
+    logger.info(f"Rejudge {rejudge.id} started for {rejudge.total} submissions")
+
+
+def pause(rejudge):
+    Rejudge.objects.filter(id=rejudge.id, status='RUNNING').update(status='PAUSED')
+
+
+def resume(rejudge):
+    """Continue a paused rejudge, or restart the driver of one whose task was lost."""
+    # A new driver id retires any driver still scheduled, so only one keeps advancing
+    rejudge.driver = uuid4().hex
+    with transaction.atomic():
+        if Rejudge.objects.filter(id=rejudge.id, status__in=('RUNNING', 'PAUSED')).update(
+            status='RUNNING', driver=rejudge.driver
+        ):
+            _schedule(rejudge)
+
+
+def cancel(rejudge):
+    # Submissions already queued are still judged
+    Rejudge.objects.filter(id=rejudge.id, status__in=('RUNNING', 'PAUSED')).update(
+        status='CANCELLED', finished_at=timezone.now()
+    )
+
+
+def _enqueue(submission_ids):
+    submissions = Submission.objects.select_related('problem', 'language').filter(id__in=submission_ids)
+    for submission in submissions.order_by('id'):
+        fair_queue.enqueue(submission)
+
+
+def advance(rejudge_id, driver):
+    """
+    Queue the next batch of a rejudge. Returns the seconds until it should
+    be advanced again, or None when there is nothing left to drive.
+    """
+    interval = settings.REJUDGE_INTERVAL
+    now = timezone.now()
+
+    with transaction.atomic():
+        rejudge = Rejudge.objects.select_for_update().filter(id=rejudge_id).first()
+        if rejudge is None or rejudge.status != 'RUNNING' or rejudge.driver != driver:
+            return None
+        rejudge.heartbeat_at = now
+
+        in_flight = rejudge.submissions.filter(status__in=IN_FLIGHT_STATUSES).count()
+        room = min(settings.REJUDGE_BATCH_SIZE, settings.REJUDGE_MAX_IN_FLIGHT - in_flight)
+        ids = []
+        if room > 0:
+            ids = list(
+                selection(rejudge).filter(id__gt=rejudge.cursor)
+                .order_by('id').values_list('id', flat=True)[:room]
+            )
+            if not ids and not in_flight:
+                rejudge.status = 'COMPLETED'
+                rejudge.finished_at = now
+                rejudge.save(update_fields=['status', 'heartbeat_at', 'finished_at'])
+                logger.info(f"Rejudge {rejudge.id} completed: {rejudge.queued} submissions")
+                return None
+
+        if ids:
+            Submission.objects.filter(id__in=ids).update(status='PENDING', rejudge=rejudge)
+            rejudge.cursor = ids[-1]
+            rejudge.queued += len(ids)
+        rejudge.save(update_fields=['cursor', 'queued', 'heartbeat_at'])
+
+        if ids:
+            transaction.on_commit(lambda: _enqueue(ids))
+
+    logger.debug(f"Rejudge {rejudge.id}: queued {len(ids)}, {in_flight} still judging")
+    return interval
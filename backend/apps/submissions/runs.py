@@ -0,0 +1,166 @@
+"""
+Interactive runs ("Run" button).
+
+A run executes code against a problem's sample test cases, or against
+stdin the user typed, without creating a Submission. It never touches the
+submissions tables. The run record lives in the cache under a short TTL
+(JUDGE_RUN_RESULT_TIMEOUT), from where the client polls it. Runs go
+through the interactive Celery queue, so they do not wait behind
+judging.
+"""
+import logging
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.exceptions import CodeExecutionError
+
+from .base_executor import get_executor_class
+from .checker import read_excerpt
+from .cpu_slots import get_cpu_slots
+from .languages import get_language_registry
+from .models import Language
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = ('status', 'execution_time', 'wall_time', 'memory_used')
+
+
+def run_key(run_id):
+    return f"run:{run_id}"
+
+
+def get_run(run_id):
+    return cache.get(run_key(run_id))
+
+
+def _save_run(record):
+    cache.set(run_key(record['id']), record, settings.JUDGE_RUN_RESULT_TIMEOUT)
+
+
+def start_run(user, problem, language, code, stdin=None):
+    """
+    Queue a run and return its record. The record is still PENDING unless
+    tasks execute eagerly, in which case it is already final.
+    """
+    from .tasks import run_code_task
+    record = {
+        'id': uuid4().hex,
+        'user': user.id,
+        'status': 'PENDING',
+        'verdict': None,
+        'error': '',
+        'results': [],
+    }
+    _save_run(record)
+    task = run_code_task.apply_async(
+        (record['id'], user.id, problem.id, language.id, code, stdin),
+    )
+    if task.ready():
+        return task.get()
+    return record
+
+
+def fail_run(run_id, user_id, error):
+    """Store a run that could not be executed at all."""
+    record = {
+        'id': run_id,
+        'user': user_id,
+        'status': 'JUDGE_ERROR',
+        'verdict': None,
+        'error': error,
+        'results': [],
+    }
+    _save_run(record)
+    return record
+
+
+def _result(result, test_case=None):
+    entry = {field: result[field] for field in RESULT_FIELDS}
+    entry['test_case'] = test_case.id if test_case else None
+    entry['error_message'] = result['error']
+    entry['output'] = result['output']
+    if result.get('output_path') and entry['status'] in ('SUCCESS', 'ACCEPTED', 'OUTPUT_LIMIT_EXCEEDED'):
+        # Users want to see what their program printed, not just an excerpt around a mismatch
+        entry['output'] = read_excerpt(result['output_path'], size=settings.JUDGE_RUN_OUTPUT_LIMIT)
+    return entry
+
+
+def _verdict(results):
+    for result in results:
+        if result['status'] not in ('SUCCESS', 'ACCEPTED'):
+            return result['status']
+    # Nothing was executed, so there is nothing to give a verdict on
+    return results[0]['status'] if results else None
+
+
+def run_code(run_id, user_id, problem, language_id, code, stdin=None):
+    """Execute a run and store its final record."""
+    from .services import CodeExecutionService
+    record = {
+        'id': run_id,
+        'user': user_id,
+        'status': 'COMPLETED',
+        'verdict': None,
+        'error': '',
+        'results': [],
+    }
+
+    try:
+        runtime = get_language_registry().get(language_id)
+    except Language.DoesNotExist:
+        record.update(status='JUDGE_ERROR', error='Unknown language')
+        _save_run(record)
+        return record
+
+    executor = None
+    try:
+        executor = get_executor_class()(
+            code=code,
+            runtime=runtime,
+            memory_limit_mb=problem.memory_limit * runtime.memory_multiplier
+        )
+        time_limit_sec = problem.time_limit / 1000 * runtime.time_multiplier
+        if stdin is not None:
+            name = executor.stage_input('stdin.in', stdin)
+            with get_cpu_slots().acquire() as cpu:
+                result = executor.execute_batch([name], time_limit_sec, cpuset=cpu)[0]
+            results = [_result(result)]
+        else:
+            test_cases = list(
+                problem.test_cases.filter(is_sample=True).defer('input_data', 'expected_output').order_by('order', 'id')
+            )
+            if not test_cases:
+                record.update(status='JUDGE_ERROR', error='This problem has no sample test cases')
+                _save_run(record)
+                return record
+            test_data = CodeExecutionService._fetch_test_data(test_cases)
+            checker = CodeExecutionService._make_checker(problem)
+            try:
+                # Every sample is run whatever the judging policy, so all of them can be shown
+                judged = CodeExecutionService._judge_groups(
+                    executor, checker, test_data, [test_cases], time_limit_sec, fail_fast=False
+                )
+            finally:
+                checker.cleanup()
+            judged = CodeExecutionService._collect_results(test_cases, judged)
+            results = [_result(result, test_case) for test_case, result in zip(test_cases, judged)]
+    except CodeExecutionError as e:
+        logger.error(f"Run {run_id} failed: {e.message} ({e.details})")
+        record.update(status='JUDGE_ERROR', error=e.message)
+        _save_run(record)
+        return record
+    except Exception:
+        # The client polls until the record leaves PENDING, so it must always be stored
+        logger.exception(f"Run {run_id} crashed")
+        record.update(status='JUDGE_ERROR', error='Internal judge error')
+        _save_run(record)
+        return record
+    finally:
+        if executor is not None:
+            executor.cleanup()
+
+    record.update(verdict=_verdict(results), results=results)
+    _save_run(record)
+    return record
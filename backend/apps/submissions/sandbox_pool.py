@@ -0,0 +1,272 @@
+"""
+Warm sandbox container pool.
+
+Keeps a small set of pre-started, network-less containers per image so that
+test cases can be run with `docker exec` instead of paying a full
+`docker run --rm` create/start/destroy cycle each time.
+
+Pools are keyed by image and limits, so a process may build up many of
+them. At most SANDBOX_POOL_MAX_POOLS are kept; beyond that the least
+recently used idle pools are shut down.
+"""
+import atexit
+import logging
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from uuid import uuid4
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_LABEL = 'coding-platform.sandbox'
+SANDBOX_USER = '65534:65534'  # nobody:nogroup
+WORK_MOUNT = '/work'
+
+
+class SandboxContainer:
+    def __init__(self, name, image):
+        self.name = name
+        self.image = image
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+    def exec_command(self, command, user=SANDBOX_USER):
+        """Build a `docker exec` command running as an unprivileged sandbox user."""
+        return ['docker', 'exec', '-u', user, '-w', '/tmp', self.name] + list(command)
+
+
+class SandboxPool:
+    def __init__(self, image, size, idle_timeout, healthcheck_interval,
+                 work_root, memory='100m', cpus='0.5', cpuset=None):
+        self.image = image
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.work_root = work_root
+        self.memory = memory
+        self.cpus = cpus
+        self.cpuset = cpuset
+
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            expired = []
+            container = None
+            create = False
+
+            with self._cond:
+                expired = self._pop_expired()
+                while not self._idle and self._total >= self.size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No sandbox available for {self.image}")
+                    self._cond.wait(remaining)
+                    expired += self._pop_expired()
+
+                if self._idle:
+                    container = self._idle.pop()
+                else:
+                    self._total += 1
+                    create = True
+
+            for stale in expired:
+                self._remove(stale)
+
+            if create:
+                try:
+                    return self._create()
+                except Exception:
+                    self._forget()
+                    raise
+
+            if self._is_healthy(container):
+                return container
+
+            logger.warning(f"Sandbox {container.name} failed health check, replacing it")
+            self.discard(container)
+
+    def release(self, container):
+        if self._closed or not self._reset(container):
+            self.discard(container)
+            return
+
+        container.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(container)
+            self._cond.notify()
+
+    def is_idle(self):
+        """True if no container is handed out."""
+        with self._cond:
+            return len(self._idle) == self._total
+
+    def discard(self, container):
+        self._remove(container)
+        self._forget()
+
+    @contextmanager
+    def sandbox(self, timeout=None):
+        container = self.acquire(timeout=timeout)
+        try:
+            yield container
+        except BaseException:
+            self.discard(container)
+            raise
+        else:
+            self.release(container)
+
+    def shutdown(self):
+        # Containers still handed out are removed when they come back
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for container in idle:
+            self._remove(container)
+
+    def _pop_expired(self):
+        now = time.monotonic()
+        expired = [c for c in self._idle if now - c.last_used > self.idle_timeout]
+        if expired:
+            self._idle = [c for c in self._idle if c not in expired]
+            self._total -= len(expired)
+        return expired
+
+    def _forget(self):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _create(self):
+        name = f"judge-sandbox-{uuid4().hex[:12]}"
+        command = [
+            "docker", "run", "-d", "--rm",
+            "--name", name,
+            "--label", f"{SANDBOX_LABEL}=1",
+            "--network=none",
+            "--read-only",
+            "--tmpfs", "/tmp:rw,exec,size=64m",
+            f"--cpus={self.cpus}",
+            f"--memory={self.memory}",
+            f"--memory-swap={self.memory}",
+            "--pids-limit=64",
+            "-v", f"{self.work_root}:{WORK_MOUNT}:ro",
+        ]
+        if self.cpuset is not None:
+            command.append(f"--cpuset-cpus={self.cpuset}")
+        command += [self.image, "sleep", "infinity"]
+        proc = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Failed to start sandbox: {proc.stderr.decode().strip()}")
+
+        logger.info(f"Started sandbox {name} ({self.image})")
+        return SandboxContainer(name, self.image)
+
+    def _is_healthy(self, container):
+        now = time.monotonic()
+        if now - container.last_checked < self.healthcheck_interval:
+            return True
+        try:
+            proc = subprocess.run(
+                ['docker', 'exec', container.name, 'true'],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=5
+            )
+        except subprocess.TimeoutExpired:
+            return False
+        container.last_checked = now
+        return proc.returncode == 0
+
+    def _reset(self, container):
+        # Kill everything except PID 1 and wipe the scratch tmpfs
+        try:
+            proc = subprocess.run(
+                ['docker', 'exec', '-u', '0', container.name, 'sh', '-c',
+                 'kill -9 -1 2>/dev/null; rm -rf /tmp/* /tmp/.[!.]* 2>/dev/null; true'],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=10
+            )
+        except subprocess.TimeoutExpired:
+            return False
+        return proc.returncode == 0
+
+    def _remove(self, container):
+        try:
+            subprocess.run(
+                ['docker', 'rm', '-f', container.name],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=30
+            )
+        except Exception as e:
+            logger.warning(f"Failed to remove sandbox {container.name}: {e}")
+
+
+_pools = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(image, memory='100m', cpus='0.5', cpuset=None):
+    # Pinned runs get their own pools since cpuset is fixed at container start
+    key = (image, memory, cpus, cpuset)
+    evicted = []
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None:
+            _pools.move_to_end(key)
+        else:
+            evicted = _evict_idle_pools(settings.SANDBOX_POOL_MAX_POOLS - 1)
+            pool = SandboxPool(
+                image,
+                size=settings.SANDBOX_POOL_SIZE,
+                idle_timeout=settings.SANDBOX_POOL_IDLE_TIMEOUT,
+                healthcheck_interval=settings.SANDBOX_POOL_HEALTHCHECK_INTERVAL,
+                work_root=settings.SANDBOX_WORK_ROOT,
+                memory=memory,
+                cpus=cpus,
+                cpuset=cpuset,
+            )
+            _pools[key] = pool
+    for stale in evicted:
+        stale.shutdown()
+    return pool
+
+
+def _evict_idle_pools(keep):
+    """Drop least recently used idle pools until at most `keep` remain, under the lock."""
+    evicted = []
+    for key in list(_pools):
+        if len(_pools) <= keep:
+            break
+        if _pools[key].is_idle():
+            evicted.append(_pools.pop(key))
+    if len(_pools) > keep:
+        logger.warning(f"{len(_pools)} sandbox pools are busy, above SANDBOX_POOL_MAX_POOLS")
+    return evicted
+
+
+@atexit.register
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+@worker_process_shutdown.connect
+def _shutdown_pools_on_worker_exit(**kwargs):
+    shutdown_pools()
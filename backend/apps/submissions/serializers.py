@@ -1,17 +1,18 @@
 from rest_framework import serializers
 from .models import Submission, TestCaseResult, Language
+from .packed_results import unpack_results
 
 class TestCaseResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = TestCaseResult
-        fields = ('id', 'test_case', 'status', 'execution_time', 'memory_used', 'output', 'error_message')
+        fields = ('id', 'test_case', 'status', 'execution_time', 'wall_time', 'memory_used', 'output', 'error_message')
 
 class SubmissionSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     problem_title = serializers.CharField(source='problem.title', read_only=True)
     problem_slug = serializers.CharField(source='problem.slug', read_only=True)
     language_name = serializers.CharField(source='language.name', read_only=True)
-    test_results = TestCaseResultSerializer(many=True, read_only=True)
+    test_results = serializers.SerializerMethodField()
     success_rate = serializers.SerializerMethodField()
 
     class Meta:
@@ -21,10 +22,30 @@ class SubmissionSerializer(serializers.ModelSerializer):
             'language_name', 'code', 'status', 'score',
             'execution_time', 'memory_used', 'test_cases_passed',
             'total_test_cases', 'error_message', 'submitted_at',
-            'judged_at', 'is_best_submission', 'test_results', 'success_rate'
+            'judged_at', 'is_best_submission', 'test_results', 'success_rate',
+            'stage_timings'
         ]
         read_only_fields = fields
 
+    def get_test_results(self, obj):
+        details = TestCaseResultSerializer(obj.test_results.all(), many=True).data
+        if obj.result_data is None:
+            # Judged before results were packed: every case has a row
+            return details
+
+        details = {detail['test_case']: detail for detail in details}
+        test_results = []
+        for entry in unpack_results(obj.result_data):
+            detail = details.get(entry['test_case'], {})
+            error_message = obj.error_message if entry['status'] == 'COMPILATION_ERROR' else ''
+            test_results.append({
+                'id': detail.get('id'),
+                **entry,
+                'output': detail.get('output', ''),
+                'error_message': detail.get('error_message', error_message),
+            })
+        return test_results
+
     def get_success_rate(self, obj):
         if obj.total_test_cases > 0:
             return round((obj.test_cases_passed / obj.total_test_cases) * 100, 2)
@@ -167,100 +167,481 @@
 #         submission.save()
 #         logger.info(f"Code execution done for submission {submission.id}. Status: {submission.status}")
 
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from coding_platform.celery import judge_queue
+from utils.exceptions import CodeExecutionError
+
 from .models import Submission, TestCaseResult
-from .docker_executor import DockerExecutor
+from .checker import OutputChecker, read_excerpt
+from .special_judge import ProgramChecker
+from .cpu_slots import get_cpu_slots
+from .base_executor import get_executor_class
+from .languages import get_language_registry
+from .test_data import get_expected_output_cache, get_expected_output_store, get_test_data_cache, get_test_data_store
+from .metrics import add_timing, get_judge_metrics, round_timings
+from .packed_results import DETAILED_STATUSES, cap_text, pack_results
+from . import fair_queue, verdict_memo
 import logging
 
 
+# Columns _finish() writes; the rest of the row is left alone
+VERDICT_UPDATE_FIELDS = [
+    'status', 'score', 'execution_time', 'memory_used',
+    'test_cases_passed', 'total_test_cases', 'error_message', 'stage_timings',
+    'result_data',
+]
+
+
 class CodeExecutionService:
     @staticmethod
     def execute_submission(submission_id):
+        """
+        Queue a submission for judging, unless an identical one was already
+        judged against the same test set. Returns True if the verdict was
+        reused and the submission is already final.
+
+        With JUDGE_WORKER set to 'async' nothing goes to Celery: the
+        submission stays PENDING until a run_judge_worker process takes it
+        from the fair queue.
+        """
+        submission = Submission.objects.select_related('problem', 'language').get(id=submission_id)
+        if verdict_memo.reuse(submission):
+            return True
+        # Waits for a judge slot behind other users' submissions, not in plain FIFO order
+        fair_queue.enqueue(submission)
+        return False
+
+    @staticmethod
+    def queue_submission(submission):
+        """
+        Queue the first judge stage of a submission.
+
+        Languages whose builds go through the compile cache are compiled
+        on the compile queue first, and the run stage then only fetches the
+        artifact. Everything else is compiled and run in one task on the
+        run queue.
+        """
+        from .tasks import compile_code_task
+        runtime = get_language_registry().get(submission.language_id)
+        if runtime.compiled and runtime.cache_artifacts:
+            compile_code_task.apply_async((submission.id,), queue=judge_queue('compile', runtime.extension))
+        else:
+            CodeExecutionService.queue_run(submission)
+
+    @staticmethod
+    def queue_run(submission, timings=None):
         from .tasks import execute_code_task
-        execute_code_task.delay(submission_id)
+        runtime = get_language_registry().get(submission.language_id)
+        execute_code_task.apply_async((submission.id, timings), queue=judge_queue('run', runtime.extension))
+
+    @staticmethod
+    def compile_submission(submission, timings):
+        """
+        Compile stage: build the submission into the compile cache.
+
+        Stage timings are added to `timings`, to be handed on to the run
+        stage. Returns True if it compiled and the run stage should follow. On a
+        compilation error or a judge error the submission is given its final
+        verdict here and False is returned. The run stage only skips the
+        build if it shares COMPILE_CACHE_DIR with the compile worker (same
+        node or a shared volume); otherwise it simply compiles again.
+        """
+        executor = None
+        try:
+            test_cases, runtime, memo_key = CodeExecutionService._start(submission, timings)
+            executor = CodeExecutionService._make_executor(submission, runtime)
+            artifact_name, compile_error = executor._compile()
+            add_timing(timings, 'compile', executor.compile_seconds)
+            if artifact_name is not None:
+                return True
+
+            results = [executor._error_result(compile_error, 'COMPILATION_ERROR') for _ in test_cases]
+            CodeExecutionService._finish(submission, test_cases, results, memo_key, timings)
+        except CodeExecutionError as e:
+            CodeExecutionService._judge_error(submission, e, timings)
+        except Exception as e:
+            CodeExecutionService._crashed(submission, e, timings)
+        finally:
+            if executor is not None:
+                executor.cleanup()
+        return False
+
+    @staticmethod
+    def _fetch_test_data(test_cases):
+        """
+        Local paths of every test case's (input, expected output) files.
+
+        Bodies come from the node's test data cache by content hash, never
+        from the database. Rows stored before hashes existed, or whose bodies
+        are missing from a store (outputs stored before they had a store of
+        their own, lost blobs), are stored again from the row on first use.
+        """
+        input_cache = get_test_data_cache()
+        output_cache = get_expected_output_cache()
+        input_store = get_test_data_store()
+        output_store = get_expected_output_store()
+        test_data = {}
+        for test_case in test_cases:
+            if (
+                not (test_case.input_hash and test_case.output_hash)
+                or not input_store.exists(test_case.input_hash)
+                or not output_store.exists(test_case.output_hash)
+            ):
+                test_case.save(update_fields=['input_data', 'expected_output'])
+            test_data[test_case.id] = (
+                input_cache.fetch(test_case.input_hash),
+                output_cache.fetch(test_case.output_hash)
+            )
+        return test_data
+
+    @staticmethod
+    def _skipped_result():
+        return {
+            'output': '',
+            'error': '',
+            'status': 'SKIPPED',
+            'execution_time': 0,
+            'wall_time': 0,
+            'memory_used': 0,
+        }
+
+    @staticmethod
+    def _parallelism(count):
+        return min(settings.JUDGE_MAX_PARALLEL_TESTS, settings.JUDGE_CPU_BUDGET, count)
+
+    @staticmethod
+    def _run_chunk(executor, test_cases, inputs, time_limit_sec, stop_on_failure=False):
+        # Each concurrent run holds its own core from the node's CPU budget
+        with get_cpu_slots().acquire() as cpu:
+            if settings.JUDGE_BATCH_MODE:
+                names = [inputs[test_case.id] for test_case in test_cases]
+                return executor.execute_batch(names, time_limit_sec, cpuset=cpu, stop_on_failure=stop_on_failure)
+
+            # One harness session per case, so memory and timings are measured the same way
+            results = []
+            for test_case in test_cases:
+                # Only crashes, timeouts and memory overruns are known here, output is checked later
+                if stop_on_failure and results and results[-1]['status'] != 'SUCCESS':
+                    results.append(CodeExecutionService._skipped_result())
+                    continue
+
+                results += executor.execute_batch(
+                    [inputs[test_case.id]],
+                    time_limit_sec,
+                    cpuset=cpu
+                )
+            return results
+
+    @staticmethod
+    def _run_test_cases(executor, test_cases, inputs, time_limit_sec, stop_on_failure=False):
+        """
+        Run test cases on up to JUDGE_MAX_PARALLEL_TESTS cores at once.
+
+        Cases are dealt round-robin into one chunk per worker and the
+        results are stitched back together, so the returned list always
+        lines up with `test_cases` regardless of completion order.
+        """
+        if not test_cases:
+            return []
+
+        workers = CodeExecutionService._parallelism(len(test_cases))
+        if workers <= 1:
+            return CodeExecutionService._run_chunk(executor, test_cases, inputs, time_limit_sec, stop_on_failure)
+
+        chunks = [test_cases[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunk_results = list(pool.map(
+                lambda chunk: CodeExecutionService._run_chunk(executor, chunk, inputs, time_limit_sec, stop_on_failure),
+                chunks
+            ))
+
+        results = [None] * len(test_cases)
+        for i, chunk_result in enumerate(chunk_results):
+            results[i::workers] = chunk_result
+        return results
+
+    @staticmethod
+    def _make_checker(problem):
+        if problem.checker_mode == 'CUSTOM':
+            return ProgramChecker(problem)
+        return OutputChecker.for_problem(problem)
 
     @staticmethod
-    def execute_code(submission):
+    def _check_results(checker, test_data, test_cases, results):
+        """
+        Check the output of every test case that ran to completion.
+
+        All of a wave's outputs go to the checker together, so a checker
+        program is started once per wave rather than once per case.
+        """
         logger = logging.getLogger(__name__)
+        pending = []
+        for test_case, result in zip(test_cases, results):
+            logger.debug(f"Test case {test_case.id}")
+            logger.debug(f"Output: '{result['output']}', Error: '{result['error']}', Status: '{result['status']}', Exec time: {result['execution_time']}")
+            if result['status'] == 'SUCCESS':
+                pending.append((result, *test_data[test_case.id]))
+
+        # Full outputs stay on disk; only an excerpt around the first mismatch is kept
+        for (result, _, _), (matched, offset, message) in zip(pending, checker.check(pending)):
+            if matched:
+                result['status'] = 'ACCEPTED'
+            else:
+                result['status'] = 'WRONG_ANSWER'
+                result['error'] = message
+                if offset is not None:
+                    result['output'] = read_excerpt(result['output_path'], offset)
+                    logger.debug(f"First mismatch at byte {offset} of the output")
+            logger.debug(f"Final status for this test case: {result['status']}")
+
+    @staticmethod
+    def _judging_plan(test_cases, problem):
+        """
+        Groups of test cases to run in order, and whether to fail fast.
+
+        ALL runs every case. FAIL_FAST runs cases in waves that double in
+        size and skips everything after the first failing wave.
+        SAMPLES_FIRST runs the sample cases and only moves on to the hidden
+        ones if all samples pass. Cases never run are reported as SKIPPED.
+        """
+        if problem.judging_policy == 'SAMPLES_FIRST':
+            groups = [
+                [test_case for test_case in test_cases if test_case.is_sample],
+                [test_case for test_case in test_cases if not test_case.is_sample],
+            ]
+        else:
+            groups = [test_cases]
+        return groups, problem.judging_policy == 'FAIL_FAST'
+
+    @staticmethod
+    def _waves(groups, fail_fast, results):
+        """
+        Yield the waves of test cases to run, in order. The caller stores
+        each wave's checked results in `results` before asking for the next.
+        """
+        def failed():
+            return any(result['status'] not in ('ACCEPTED', 'SKIPPED') for result in results.values())
+
+        for group in groups:
+            wave_size = max(1, CodeExecutionService._parallelism(len(group))) if fail_fast else len(group)
+            start = 0
+            while start < len(group):
+                yield group[start:start + wave_size]
+                if fail_fast and failed():
+                    return
+                start += wave_size
+                wave_size *= 2
+            if failed():
+                return
+
+    @staticmethod
+    def _collect_results(test_cases, results):
+        return [
+            results.get(test_case.id) or CodeExecutionService._skipped_result()
+            for test_case in test_cases
+        ]
+
+    @staticmethod
+    def _judge_test_cases(executor, test_cases, problem, time_limit_sec, timings=None):
+        """Run and check test cases according to the problem's judging policy."""
+        groups, fail_fast = CodeExecutionService._judging_plan(test_cases, problem)
+        test_data = CodeExecutionService._fetch_test_data(test_cases)
+        checker = CodeExecutionService._make_checker(problem)
+        try:
+            results = CodeExecutionService._judge_groups(
+                executor, checker, test_data, groups, time_limit_sec, fail_fast, timings
+            )
+        finally:
+            checker.cleanup()
+        return CodeExecutionService._collect_results(test_cases, results)
+
+    @staticmethod
+    def _judge_groups(executor, checker, test_data, groups, time_limit_sec, fail_fast, timings=None):
+        """
+        Run and check `groups` wave by wave. Time spent running (less
+        compiling, which happens on the first run) and checking is added
+        to `timings`.
+        """
+        inputs = {test_case_id: executor.stage_test_data(paths[0]) for test_case_id, paths in test_data.items()}
+        results = {}
+        run_seconds = 0.0
+        for wave in CodeExecutionService._waves(groups, fail_fast, results):
+            start = time.perf_counter()
+            wave_results = CodeExecutionService._run_test_cases(
+                executor, wave, inputs, time_limit_sec, stop_on_failure=fail_fast
+            )
+            run_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            CodeExecutionService._check_results(checker, test_data, wave, wave_results)
+            add_timing(timings, 'check', time.perf_counter() - start)
+            for test_case, result in zip(wave, wave_results):
+                results[test_case.id] = result
+
+        add_timing(timings, 'compile', executor.compile_seconds)
+        add_timing(timings, 'run', max(0.0, run_seconds - executor.compile_seconds))
+        return results
+
+    @staticmethod
+    def _start(submission, timings):
+        """
+        Mark a submission as running and load what judging it needs.
+        Returns (test_cases, runtime, memo_key).
+        """
+        # Kept from an earlier stage of the same judging (compile queue), if any.
+        # A rejudged submission was submitted long ago and waits behind the rejudge throttle by design.
+        if submission.rejudge_id is None:
+            timings.setdefault('queue_wait', max(0.0, (timezone.now() - submission.submitted_at).total_seconds()))
         submission.status = 'RUNNING'
-        submission.save()
+        submission.save(update_fields=['status'])
 
-        submission.test_results.all().delete()
+        # Results of an earlier judging stay visible until _finish() replaces them
+        # Keyed before judging, so the memo matches the test set actually used
+        memo_key = verdict_memo.memo_key(submission)
 
-        test_cases = submission.problem.test_cases.all()
-        passed = 0
-        total_time = 0
-        test_statuses = []
+        # Test bodies are read from the test data store, not the database
+        test_cases = list(
+            submission.problem.test_cases.defer('input_data', 'expected_output').order_by('order', 'id')
+        )
+        runtime = get_language_registry().get(submission.language_id)
+        return test_cases, runtime, memo_key
 
-        executor = DockerExecutor(
+    @staticmethod
+    def _make_executor(submission, runtime):
+        return get_executor_class()(
             code=submission.code,
-            extension=submission.language.file_extension,
-            language=submission.language.name
+            runtime=runtime,
+            memory_limit_mb=submission.problem.memory_limit * runtime.memory_multiplier
         )
 
-        for test_case in test_cases:
-            # Ensure input_data is properly formatted
-            input_data = test_case.input_data.strip()
-            if not input_data.endswith('\n'):
-                input_data += '\n'
-            
-            output, error, status, exec_time = executor.execute(
-                input_data=input_data,
-                time_limit_sec=submission.problem.time_limit / 1000
+    @staticmethod
+    def _time_limit_sec(submission, runtime):
+        # Limits apply to CPU time, scaled for slower language runtimes
+        return submission.problem.time_limit / 1000 * runtime.time_multiplier
+
+    @staticmethod
+    def _judge_error(submission, error, timings=None):
+        # A broken checker, corrupt test data or a failing sandbox is not the submission's fault
+        logger = logging.getLogger(__name__)
+        logger.error(f"Judging submission {submission.id} failed: {error.message} ({error.details})")
+        submission.status = 'JUDGE_ERROR'
+        submission.score = 0
+        submission.error_message = error.message
+        submission.stage_timings = round_timings(timings or {})
+        submission.result_data = None
+        with transaction.atomic():
+            # Results of an earlier judging no longer match the verdict
+            submission.test_results.all().delete()
+            submission.save(update_fields=['status', 'score', 'error_message', 'stage_timings', 'result_data'])
+        get_judge_metrics().observe_submission(submission.language.name, submission.status, timings or {})
+
+    @staticmethod
+    def _crashed(submission, exception, timings=None):
+        # Judge tasks are not retried, so a claimed submission must not stay RUNNING
+        logger = logging.getLogger(__name__)
+        logger.exception(f"Judging submission {submission.id} crashed")
+        error = CodeExecutionError("Internal judge error", error_type="JUDGE_ERROR", details=str(exception))
+        CodeExecutionService._judge_error(submission, error, timings)
+
+    @staticmethod
+    def execute_code(submission, timings=None):
+        """Judge a submission; `timings` carries stage timings from the compile stage."""
+        timings = dict(timings or {})
+        executor = None
+        try:
+            test_cases, runtime, memo_key = CodeExecutionService._start(submission, timings)
+            executor = CodeExecutionService._make_executor(submission, runtime)
+            results = CodeExecutionService._judge_test_cases(
+                executor, test_cases, submission.problem,
+                CodeExecutionService._time_limit_sec(submission, runtime),
+                timings
             )
+        except CodeExecutionError as e:
+            CodeExecutionService._judge_error(submission, e, timings)
+            return
+        except Exception as e:
+            CodeExecutionService._crashed(submission, e, timings)
+            return
+        finally:
+            if executor is not None:
+                executor.cleanup()
+
+        try:
+            CodeExecutionService._finish(submission, test_cases, results, memo_key, timings)
+        except Exception as e:
+            CodeExecutionService._crashed(submission, e, timings)
 
-            logger.info(f"Test case input: '{test_case.input_data}'")
-            logger.info(f"Output: '{output}', Error: '{error}', Status: '{status}', Exec time: {exec_time}")
-
-            if status == 'SUCCESS':
-                # Improved output comparison
-                actual_output = output.strip()
-                expected_output = test_case.expected_output.strip()
-                
-                logger.info(f"Actual output: '{actual_output}'")
-                logger.info(f"Expected output: '{expected_output}'")
-                
-                # Compare outputs (handle both string and numeric comparisons)
-                if actual_output == expected_output:
-                    status = 'ACCEPTED'
-                    passed += 1
-                else:
-                    # Try numeric comparison for cases where formatting might differ
-                    try:
-                        actual_nums = [float(x) for x in actual_output.split()]
-                        expected_nums = [float(x) for x in expected_output.split()]
-                        if actual_nums == expected_nums:
-                            status = 'ACCEPTED'
-                            passed += 1
-                        else:
-                            status = 'WRONG_ANSWER'
-                    except (ValueError, TypeError):
-                        # If not numeric, stick with string comparison result
-                        status = 'WRONG_ANSWER'
-                        
-                logger.info(f"Final status for this test case: {status}")
-
-            TestCaseResult.objects.create(
-                submission=submission,
-                test_case=test_case,
-                status=status,
-                execution_time=exec_time,
-                memory_used=0,
-                output=output,
-                error_message=error
+    @staticmethod
+    def _finish(submission, test_cases, results, memo_key, timings=None):
+        """
+        Store per-test results and the final verdict of a judged submission,
+        with its stage timings, and record them in the judge metrics.
+
+        Every result goes into the packed result_data column. Only failing
+        cases get a TestCaseResult row, for their (capped) output and error.
+        If the sandbox failed on any case there is no verdict: the submission
+        gets a judge error, which is never memoized.
+        """
+        timings = timings if timings is not None else {}
+        failed = next((result for result in results if result['status'] == 'JUDGE_ERROR'), None)
+        if failed is not None:
+            CodeExecutionService._judge_error(
+                submission, CodeExecutionError("Internal judge error", error_type="JUDGE_ERROR", details=failed['error']), timings
             )
+            return
+        logger = logging.getLogger(__name__)
+        passed = 0
+        total_time = 0
+        run_count = 0
+        max_memory = 0
+        test_statuses = []
+        packed = []
+        test_results = []
+        compile_error = ''
+        detail_limit = settings.JUDGE_STORED_DETAIL_SIZE
+
+        for test_case, result in zip(test_cases, results):
+            status = result['status']
+            if status == 'ACCEPTED':
+                passed += 1
+
+            packed.append((
+                test_case.id, status, result['execution_time'], result['wall_time'], result['memory_used']
+            ))
+            if status in DETAILED_STATUSES:
+                test_results.append(TestCaseResult(
+                    submission=submission,
+                    test_case=test_case,
+                    status=status,
+                    execution_time=result['execution_time'],
+                    wall_time=result['wall_time'],
+                    memory_used=result['memory_used'],
+                    output=cap_text(result['output'], detail_limit),
+                    error_message=cap_text(result['error'], detail_limit)
+                ))
+            elif status == 'COMPILATION_ERROR' and not compile_error:
+                # The same for every test case, so it is kept once on the submission
+                compile_error = cap_text(result['error'], detail_limit)
 
             test_statuses.append(status)
-            total_time += exec_time
-
-        executor.cleanup()
+            if status != 'SKIPPED':
+                run_count += 1
+                total_time += result['execution_time']
+            max_memory = max(max_memory, result['memory_used'])
 
         # Final verdict
         submission.test_cases_passed = passed
         submission.total_test_cases = len(test_cases)
-        submission.execution_time = total_time // len(test_cases) if test_cases else 0
-        submission.memory_used = 0
+        submission.execution_time = total_time // run_count if run_count else 0
+        submission.memory_used = max_memory
 
-        logger.info(f"Passed testcases: {passed} out of {len(test_cases)} total testcases")
+        logger.debug(f"Passed testcases: {passed} out of {len(test_cases)} total testcases")
 
         if passed == len(test_cases):
             submission.status = 'ACCEPTED'
@@ -271,6 +652,12 @@ class CodeExecutionService:
         elif 'RUNTIME_ERROR' in test_statuses:
             submission.status = 'RUNTIME_ERROR'
             submission.score = 0
+        elif 'MEMORY_LIMIT_EXCEEDED' in test_statuses:
+            submission.status = 'MEMORY_LIMIT_EXCEEDED'
+            submission.score = (passed / len(test_cases)) * 100
+        elif 'OUTPUT_LIMIT_EXCEEDED' in test_statuses:
+            submission.status = 'OUTPUT_LIMIT_EXCEEDED'
+            submission.score = (passed / len(test_cases)) * 100
         elif 'TIME_LIMIT_EXCEEDED' in test_statuses:
             submission.status = 'TIME_LIMIT_EXCEEDED'
             submission.score = (passed / len(test_cases)) * 100
@@ -278,5 +665,27 @@ class CodeExecutionService:
             submission.status = 'WRONG_ANSWER'
             submission.score = (passed / len(test_cases)) * 100
 
-        submission.save()
-        logger.info(f"Code execution completed for submission {submission.id}. Status: {submission.status}, Score: {submission.score}")
\ No newline at end of file
+        # Results are replaced and the verdict set in one transaction, so a rejudge is
+        # never seen half done, and all results go in one INSERT instead of one per test
+        with transaction.atomic():
+            start = time.perf_counter()
+            submission.test_results.all().delete()
+            TestCaseResult.objects.bulk_create(test_results)
+            timings['persist'] = time.perf_counter() - start
+
+            # Clears what a judge error left before a rejudge
+            submission.error_message = compile_error
+            submission.result_data = pack_results(packed)
+            submission.stage_timings = round_timings(timings)
+            submission.save(update_fields=VERDICT_UPDATE_FIELDS)
+        verdict_memo.remember(submission, memo_key)
+        get_judge_metrics().observe_submission(
+            submission.language.name,
+            submission.status,
+            timings,
+            [result['wall_time'] / 1000 for result in results if result['status'] != 'SKIPPED']
+        )
+        logger.info(
+            f"Code execution completed for submission {submission.id}. Status: {submission.status}, "
+            f"Score: {submission.score}, Stages: {submission.stage_timings}"
+        )
\ No newline at end of file
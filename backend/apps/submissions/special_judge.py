@@ -0,0 +1,127 @@
+"""
+Checker programs ("special judges") for problems with more than one valid
+answer.
+
+A checker is a program attached to the problem. It is run once per batch
+of test cases, not once per case. On stdin it gets one line per case with
+three paths, the test input, the expected output and the contestant's
+output:
+
+    <input> <expected output> <contestant output>
+
+For every line, in order, it must print one line starting with `OK` or
+`WA`, optionally followed by a message shown with the result. A checker
+that crashes, times out or prints fewer lines fails the judging of the
+submission instead of producing a verdict.
+
+Checkers run in the same sandbox as submissions through the configured
+executor backend. C++ checkers go through the content-addressed compile
+cache, so each checker is compiled once per node, not once per
+submission.
+"""
+import logging
+import os
+import shutil
+from uuid import uuid4
+
+from django.conf import settings
+
+from utils.exceptions import CodeExecutionError
+
+from .base_executor import get_executor_class
+from .checker import read_excerpt
+from .cpu_slots import get_cpu_slots
+from .languages import get_language_registry
+from .models import Language
+
+logger = logging.getLogger(__name__)
+
+CHECKER_EXTENSIONS = {
+    "python": "py",
+    "cpp": "cpp",
+}
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+    os.chmod(destination, 0o644)
+
+
+class ProgramChecker:
+    def __init__(self, problem):
+        self.problem = problem
+        try:
+            runtime = get_language_registry().by_extension(CHECKER_EXTENSIONS[problem.checker_language])
+        except Language.DoesNotExist as e:
+            raise CodeExecutionError("No language to run the checker program", error_type="CHECKER_ERROR", details=str(e))
+        self.executor = get_executor_class()(code=problem.checker_code, runtime=runtime)
+
+    def _stage_case(self, prefix, result, input_path, expected_path):
+        # Not outputs/, which holds the checker's own output and is hidden from the sandbox
+        cases_dir = os.path.join(self.executor.temp_dir, "cases")
+        os.makedirs(cases_dir, mode=0o755, exist_ok=True)
+
+        # Only the checker's work directory ever gets expected outputs
+        output_name = f"cases/{prefix}.out"
+        _link_or_copy(result["output_path"], os.path.join(self.executor.temp_dir, output_name))
+        return " ".join([
+            self.executor._sandbox_path(self.executor.stage_test_data(input_path)),
+            self.executor._sandbox_path(self.executor.stage_test_data(expected_path)),
+            self.executor._sandbox_path(output_name),
+        ])
+
+    def check(self, cases):
+        """
+        Check (result, input_path, expected_path) triples in one checker
+        run, returning (matched, offset, message) for each.
+        """
+        if not cases:
+            return []
+
+        batch_id = uuid4().hex[:8]
+        listing = "\n".join(
+            self._stage_case(f"{batch_id}_{i}", result, input_path, expected_path)
+            for i, (result, input_path, expected_path) in enumerate(cases)
+        )
+        name = self.executor.stage_input(f"{batch_id}.list", listing)
+
+        # The checker is a sandbox run like any test, so it needs a core of the budget too
+        with get_cpu_slots().acquire() as cpu:
+            run = self.executor.execute_batch(
+                [name],
+                settings.JUDGE_CHECKER_TIME_LIMIT * len(cases),
+                cpuset=cpu
+            )[0]
+        if run["status"] != "SUCCESS":
+            raise CodeExecutionError(
+                "Checker program failed",
+                error_type="CHECKER_ERROR",
+                details=f"{run['status']}: {run['error']}"
+            )
+
+        with open(run["output_path"], errors="replace") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        if len(lines) < len(cases):
+            raise CodeExecutionError(
+                "Checker program returned fewer verdicts than test cases",
+                error_type="CHECKER_ERROR",
+                details=read_excerpt(run["output_path"])
+            )
+
+        verdicts = []
+        for line in lines[:len(cases)]:
+            verdict, _, message = line.partition(" ")
+            if verdict not in ("OK", "WA"):
+                raise CodeExecutionError(
+                    f"Unknown checker verdict: {verdict}",
+                    error_type="CHECKER_ERROR",
+                    details=line
+                )
+            verdicts.append((verdict == "OK", None, message[:settings.JUDGE_OUTPUT_EXCERPT_SIZE]))
+        return verdicts
+
+    def cleanup(self):
+        self.executor.cleanup()
@@ -1,11 +1,68 @@
+import logging
+
 from celery import shared_task
+from celery.signals import worker_ready
+from apps.problems.models import Problem
+from .base_executor import get_executor_class
+from .docker_executor import DockerExecutor, check_language_images
 from .models import Submission
 from .services import CodeExecutionService
+from . import fair_queue, rejudge, runs
+
+logger = logging.getLogger(__name__)
+
+@worker_ready.connect
+def check_sandbox_images(**kwargs):
+    # An image without python3 would fail every submission in its language
+    if not issubclass(get_executor_class(), DockerExecutor):
+        return
+    for image, (names, error) in check_language_images().items():
+        if error is not None:
+            logger.error(f"The judge harness cannot run in {image} ({', '.join(names)}): {error}")
+
+@shared_task
+def compile_code_task(submission_id):
+    queued_run = False
+    try:
+        submission = Submission.objects.select_related('problem', 'language').get(id=submission_id)
+        timings = {}
+        if CodeExecutionService.compile_submission(submission, timings):
+            CodeExecutionService.queue_run(submission, timings)
+            queued_run = True
+    except Submission.DoesNotExist:
+        pass
+    finally:
+        # Otherwise the judge slot passes on to the run stage
+        if not queued_run:
+            fair_queue.release(submission_id)
 
 @shared_task
-def execute_code_task(submission_id):
+def execute_code_task(submission_id, timings=None):
     try:
-        submission = Submission.objects.get(id=submission_id)
-        CodeExecutionService.execute_code(submission)
+        submission = Submission.objects.select_related('problem', 'language').get(id=submission_id)
+        CodeExecutionService.execute_code(submission, timings)
     except Submission.DoesNotExist:
         pass
+    finally:
+        fair_queue.release(submission_id)
+
+@shared_task(ignore_result=True)
+def run_code_task(run_id, user_id, problem_id, language_id, code, stdin=None):
+    try:
+        problem = Problem.objects.get(id=problem_id)
+    except Problem.DoesNotExist:
+        return runs.fail_run(run_id, user_id, 'Problem not found')
+    return runs.run_code(run_id, user_id, problem, language_id, code, stdin)
+
+@shared_task(ignore_result=True)
+def rejudge_task(rejudge_id, driver):
+    countdown = rejudge.advance(rejudge_id, driver)
+    # Eager tasks (development) judge each batch inline, so nothing is in flight to wait for
+    while countdown is not None and rejudge_task.app.conf.task_always_eager:
+        countdown = rejudge.advance(rejudge_id, driver)
+    if countdown is not None:
+        rejudge_task.apply_async((rejudge_id, driver), countdown=countdown)
+
+@shared_task(ignore_result=True)
+def dispatch_fair_queue_task():
+    fair_queue.dispatch()
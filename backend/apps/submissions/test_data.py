@@ -0,0 +1,166 @@
+"""
+Content-addressed test data.
+
+Test inputs and expected outputs are stored as files named by the sha256 of
+their content. TestDataStore is the shared origin, a directory standing in
+for an object store. Every judge node keeps a bounded local TestDataCache
+of it, and each file is checksum-verified as it is pulled in.
+
+Inputs and expected outputs live in separate stores and caches
+(TEST_DATA_* and TEST_OUTPUT_*). Neither is mounted into sandboxes: a
+submission only gets links to its own inputs in its work directory (see
+BaseExecutor.stage_test_data), and expected outputs are only linked into
+the work directory of a checker program. The output store and cache are
+private to the judge's uid.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+from utils.exceptions import CodeExecutionError
+
+from .compile_cache import CompileCache
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def normalize_input(input_data):
+    # Inputs are fed to stdin without leading blank space and always end with a newline
+    data = input_data.lstrip()
+    if not data.endswith("\n"):
+        data += "\n"
+    return data
+
+
+class TestDataStore:
+    def __init__(self, root, dir_mode=0o755):
+        self.root = root
+        self.dir_mode = dir_mode
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, content):
+        """Store `content` (str) unless already present, returning its key."""
+        data = content.encode()
+        key = hashlib.sha256(data).hexdigest()
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(os.path.dirname(path), mode=self.dir_mode, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(temp_path, 0o444)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return key
+
+
+class TestDataCache(CompileCache):
+    """Node-local, LRU-bounded copy of the test data store."""
+    file_mode = 0o444
+
+    def __init__(self, root, max_size, store, dir_mode=0o755):
+        super().__init__(root, max_size)
+        self.store = store
+        self.dir_mode = dir_mode
+        os.makedirs(root, mode=dir_mode, exist_ok=True)
+        os.chmod(root, dir_mode)
+
+    def fetch(self, key):
+        """Local path of the file for `key`, pulling it from the store on a miss."""
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        try:
+            source = open(self.store.path(key), "rb")
+        except OSError as e:
+            raise CodeExecutionError(
+                "Test data is missing from the store",
+                error_type="JUDGE_ERROR",
+                details=str(e)
+            )
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), mode=self.dir_mode, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            digest = hashlib.sha256()
+            with source, os.fdopen(fd, "wb") as f:
+                while chunk := source.read(COPY_CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            if digest.hexdigest() != key:
+                raise CodeExecutionError(
+                    "Test data failed checksum verification",
+                    error_type="TEST_DATA_ERROR",
+                    details=key
+                )
+            os.chmod(temp_path, self.file_mode)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        self.evict(size)
+        return path
+
+
+# Expected outputs must never be readable by a submission
+PRIVATE_DIR_MODE = 0o700
+
+_store = None
+_cache = None
+_output_store = None
+_output_cache = None
+
+
+def get_test_data_store():
+    global _store
+    if _store is None:
+        _store = TestDataStore(settings.TEST_DATA_STORE_DIR)
+    return _store
+
+
+def get_test_data_cache():
+    global _cache
+    if _cache is None:
+        _cache = TestDataCache(settings.TEST_DATA_CACHE_DIR, settings.TEST_DATA_CACHE_MAX_SIZE, get_test_data_store())
+    return _cache
+
+
+def get_expected_output_store():
+    global _output_store
+    if _output_store is None:
+        _output_store = TestDataStore(settings.TEST_OUTPUT_STORE_DIR, PRIVATE_DIR_MODE)
+    return _output_store
+
+
+def get_expected_output_cache():
+    global _output_cache
+    if _output_cache is None:
+        _output_cache = TestDataCache(
+            settings.TEST_OUTPUT_CACHE_DIR, settings.TEST_DATA_CACHE_MAX_SIZE,
+            get_expected_output_store(), PRIVATE_DIR_MODE
+        )
+    return _output_cache
+
+
+def store_test_case(test_case):
+    """Write a test case's bodies to their stores and record their keys on it."""
+    test_case.input_hash = get_test_data_store().put(normalize_input(test_case.input_data))
+    test_case.output_hash = get_expected_output_store().put(test_case.expected_output)
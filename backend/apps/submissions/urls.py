@@ -6,6 +6,9 @@ app_name = 'submissions'
 urlpatterns = [
     path('languages/', views.LanguageListView.as_view(), name='language-list'),
     path('submit/', views.submit_code, name='submit-code'),
+    path('run/', views.run_code, name='run-code'),
+    path('run/<str:run_id>/', views.run_detail, name='run-detail'),
+    path('queue/', views.queue_status, name='queue-status'),
     path('history/', views.user_submissions, name='submission-history'),
     path('<int:pk>/', views.submission_detail, name='submission-detail'),
 ]
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Verdict memoization.
+
+A verdict only depends on the code, the language and the problem's test
+set and judging configuration. Once a submission has been judged, its id is
+remembered in the cache under a hash of all of those. A later byte-for-byte
+(after normalization) identical submission copies the verdict and per-test
+results straight from it, without queueing or touching a sandbox.
+
+The test-set version folds in every test case's content hash, so adding,
+removing or editing a test case (or changing limits, policy or checker)
+yields new keys and old memos simply stop matching.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Submission, TestCaseResult
+
+logger = logging.getLogger(__name__)
+
+# Timing-dependent and infrastructure verdicts are always judged again
+MEMOIZED_STATUSES = {
+    'ACCEPTED',
+    'WRONG_ANSWER',
+    'COMPILATION_ERROR',
+    'RUNTIME_ERROR',
+    'MEMORY_LIMIT_EXCEEDED',
+    'OUTPUT_LIMIT_EXCEEDED',
+}
+
+VERDICT_FIELDS = (
+    'status', 'score', 'execution_time', 'memory_used',
+    'test_cases_passed', 'total_test_cases', 'error_message', 'output',
+    'result_data',
+)
+
+
+def normalize_code(code):
+    # Line endings and trailing whitespace never change what a program does
+    lines = [line.rstrip() for line in code.replace('\r\n', '\n').split('\n')]
+    return '\n'.join(lines).strip('\n')
+
+
+def test_set_version(problem):
+    """
+    Hash of everything about a problem that can change a verdict.
+
+    Test cases are identified by the content hashes TestCase.save() keeps
+    up to date, so changes made through queryset update() or raw SQL are
+    not noticed.
+    """
+    digest = hashlib.sha256()
+    config = (
+        problem.time_limit, problem.memory_limit, problem.judging_policy,
+        problem.checker_mode, problem.float_abs_tolerance, problem.float_rel_tolerance,
+        problem.checker_language, problem.checker_code,
+    )
+    digest.update(repr(config).encode())
+    rows = problem.test_cases.order_by('order', 'id').values_list(
+        'id', 'order', 'is_sample', 'input_hash', 'output_hash'
+    )
+    for row in rows:
+        digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+
+def memo_key(submission):
+    language = submission.language
+    digest = hashlib.sha256()
+    for part in (
+        normalize_code(submission.code),
+        str(submission.problem_id),
+        repr((
+            language.id, language.version, language.image, language.compile_command,
+            language.execute_command, language.time_multiplier, language.memory_multiplier,
+            language.source_filename, language.file_extension,
+        )),
+        test_set_version(submission.problem),
+    ):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return f"verdict:{digest.hexdigest()}"
+
+
+def remember(submission, key):
+    """Memoize a judged submission under `key`, taken before judging started."""
+    if submission.status not in MEMOIZED_STATUSES:
+        return
+    cache.set(key, submission.id, settings.VERDICT_MEMO_TIMEOUT)
+
+
+def reuse(submission):
+    """
+    Judge `submission` from a memoized identical one. Returns True if the
+    verdict and test results were copied over, False on a miss.
+    """
+    source_id = cache.get(memo_key(submission))
+    if source_id is None or source_id == submission.id:
+        return False
+
+    try:
+        source = Submission.objects.get(id=source_id)
+    except Submission.DoesNotExist:
+        return False
+    if source.status not in MEMOIZED_STATUSES:
+        return False
+
+    with transaction.atomic():
+        for field in VERDICT_FIELDS:
+            setattr(submission, field, getattr(source, field))
+        submission.save()
+
+        TestCaseResult.objects.bulk_create([
+            TestCaseResult(
+                submission=submission,
+                test_case_id=result.test_case_id,
+                status=result.status,
+                execution_time=result.execution_time,
+                wall_time=result.wall_time,
+                memory_used=result.memory_used,
+                output=result.output,
+                error_message=result.error_message
+            )
+            for result in source.test_results.all()
+        ])
+
+    logger.info(f"Submission {submission.id} judged from memoized submission {source.id}: {submission.status}")
+    return True
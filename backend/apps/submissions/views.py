@@ -1,3 +1,8 @@
+import math
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -6,6 +11,8 @@ from .models import Submission, Language
 from .serializers import SubmissionSerializer, LanguageSerializer
 from apps.problems.models import Problem
 from .services import CodeExecutionService
+from . import fair_queue, rate_limit, runs
+from .metrics import get_judge_metrics, render_gauge
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -24,18 +31,92 @@ def submit_code(request):
     except:
         return Response({"error": "Invalid problem or language."}, status=400)
 
-    submission = Submission.objects.create(
-        user=user,
-        problem=problem,
-        language=language,
-        code=code,
-        status='PENDING'
-    )
+    # Resubmitting the same code is answered with the earlier submission, not judged again
+    duplicate_key = rate_limit.duplicate_key(user.id, problem.id, language.id, code)
+    duplicate_id = rate_limit.claim_submission(duplicate_key)
+    if duplicate_id is not None:
+        duplicate = Submission.objects.filter(id=duplicate_id, user=user).first()
+        if duplicate is None:
+            return Response({"error": "An identical submission is already being processed."}, status=409)
+        return Response(SubmissionSerializer(duplicate).data, status=200)
 
-    CodeExecutionService.execute_submission(submission.id)
+    retry_after = rate_limit.take_submission_token(user.id, problem.id)
+    if retry_after:
+        rate_limit.release_submission(duplicate_key)
+        seconds = math.ceil(retry_after)
+        return Response(
+            {"error": f"Too many submissions. Try again in {seconds} seconds.", "retry_after": seconds},
+            status=429,
+            headers={'Retry-After': str(seconds)}
+        )
+
+    try:
+        submission = Submission.objects.create(
+            user=user,
+            problem=problem,
+            language=language,
+            code=code,
+            status='PENDING'
+        )
+    except Exception:
+        # Otherwise resubmitting would be refused as a duplicate of nothing until the key expires
+        rate_limit.release_submission(duplicate_key)
+        raise
+    rate_limit.record_submission(duplicate_key, submission.id)
+
+    if CodeExecutionService.execute_submission(submission.id):
+        # Judged from a memoized verdict already
+        submission.refresh_from_db()
     serializer = SubmissionSerializer(submission)
     return Response(serializer.data, status=201)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def run_code(request):
+    """
+    Run code against the problem's samples, or against `input` if given.
+    Nothing is stored in the database; poll run_detail for the result.
+    """
+    code = request.data.get('code')
+    language_id = request.data.get('language')
+    problem_id = request.data.get('problem')
+    stdin = request.data.get('input')
+
+    if not all([code, language_id, problem_id]):
+        return Response({"error": "Missing required fields."}, status=400)
+    if stdin is not None and not isinstance(stdin, str):
+        return Response({"error": "Input must be a string."}, status=400)
+    if stdin is not None and len(stdin.encode()) > settings.JUDGE_RUN_INPUT_LIMIT:
+        return Response({"error": "Input is too large."}, status=400)
+
+    try:
+        problem = Problem.objects.get(id=problem_id)
+        language = Language.objects.get(id=language_id, is_active=True)
+    except (Problem.DoesNotExist, Language.DoesNotExist, ValueError):
+        return Response({"error": "Invalid problem or language."}, status=400)
+
+    record = runs.start_run(request.user, problem, language, code, stdin)
+    return Response(record, status=202)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def run_detail(request, run_id):
+    record = runs.get_run(run_id)
+    if record is None or record['user'] != request.user.id:
+        return Response({"error": "Run not found or expired."}, status=404)
+    return Response(record)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def queue_status(request):
+    """How many of the user's submissions are waiting for a judge slot."""
+    depths, in_flight = fair_queue.queue_stats()
+    return Response({
+        "queued": depths.get(str(request.user.id), 0),
+        "active_users": sum(1 for owner in depths if not owner.startswith(fair_queue.REJUDGE_FLOW_PREFIX)),
+        "judging": in_flight,
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_submissions(request):
@@ -55,4 +136,27 @@ def submission_detail(request, pk):
 
 class LanguageListView(generics.ListAPIView):
     queryset = Language.objects.filter(is_active=True)
-    serializer_class = LanguageSerializer
\ No newline at end of file
+    serializer_class = LanguageSerializer
+
+def judge_metrics(request):
+    """
+    Judge metrics for Prometheus. Scrapers authenticate with
+    `Authorization: Bearer <METRICS_TOKEN>`; without a token configured
+    the endpoint only exists in DEBUG.
+    """
+    if settings.METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        if not constant_time_compare(header, f'Bearer {settings.METRICS_TOKEN}'):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        raise Http404
+    depths, in_flight = fair_queue.queue_stats()
+    body = (
+        get_judge_metrics().render()
+        + render_gauge(
+            'judge_fair_queue_depth', 'Submissions waiting for a judge slot, per user.',
+            {(('user', user_id),): depth for user_id, depth in depths.items()}
+        )
+        + render_gauge('judge_fair_in_flight', 'Submissions holding a judge slot.', {(): in_flight})
+    )
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
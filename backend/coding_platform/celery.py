@@ -5,6 +5,7 @@ Handles asynchronous task processing for code execution and background jobs.
 import os
 from celery import Celery
 from django.conf import settings
+from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coding_platform.settings.development')
@@ -18,12 +19,62 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs
 app.autodiscover_tasks()
 
+# Queue topology
+# A worker started without -Q consumes every queue below; dedicated pools pick theirs, e.g.
+#   celery -A coding_platform worker -Q interactive          (quick sample runs)
+#   celery -A coding_platform worker -Q compile.cpp,compile  (compile farm)
+#   celery -A coding_platform worker -Q run.py               (Python runners)
+#   celery -A coding_platform worker -Q default,maintenance  (everything else, beat jobs)
+# Bulk rejudges have no queue of their own: they go through the fair queue as low-weight flows
+JUDGE_STAGES = ('compile', 'run')
+INTERACTIVE_QUEUE = 'interactive'
+MAINTENANCE_QUEUE = 'maintenance'
+
+app.conf.task_queues = [
+    Queue(settings.CELERY_TASK_DEFAULT_QUEUE),
+    # High-priority lane for interactive runs, so they never wait behind judging
+    Queue(INTERACTIVE_QUEUE),
+    Queue(MAINTENANCE_QUEUE),
+    *(Queue(stage) for stage in JUDGE_STAGES),
+    *(
+        Queue(f'{stage}.{extension}')
+        for stage in JUDGE_STAGES
+        for extension in settings.JUDGE_LANGUAGE_QUEUES
+    ),
+]
+
+# Where tasks go when the caller does not pick a per-language queue with judge_queue()
+app.conf.task_routes = {
+    'apps.submissions.tasks.compile_code_task': {'queue': 'compile'},
+    'apps.submissions.tasks.execute_code_task': {'queue': 'run'},
+    'apps.submissions.tasks.run_code_task': {'queue': INTERACTIVE_QUEUE},
+    'apps.submissions.tasks.cleanup_old_submissions': {'queue': MAINTENANCE_QUEUE},
+    'apps.submissions.tasks.rejudge_task': {'queue': MAINTENANCE_QUEUE},
+    'apps.submissions.tasks.dispatch_fair_queue_task': {'queue': MAINTENANCE_QUEUE},
+}
+
+# Judge tasks are long; prefetching would park queued submissions behind a busy worker
+app.conf.worker_prefetch_multiplier = 1
+app.conf.task_acks_late = True
+
+
+def judge_queue(stage, extension):
+    """Queue for a judge `stage` ('compile' or 'run') of a language, by file extension."""
+    if extension in settings.JUDGE_LANGUAGE_QUEUES:
+        return f'{stage}.{extension}'
+    return stage
+
 # Optional: Configure periodic tasks
 app.conf.beat_schedule = {
     'cleanup-old-submissions': {
         'task': 'apps.submissions.tasks.cleanup_old_submissions',
         'schedule': 60.0 * 60.0 * 24.0,  # Daily
     },
+    # Refills judge slots taken back from dead workers
+    'dispatch-fair-queue': {
+        'task': 'apps.submissions.tasks.dispatch_fair_queue_task',
+        'schedule': 30.0,
+    },
 }
 
 @app.task(bind=True)
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -172,6 +172,116 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Queue layout and routing live in coding_platform/celery.py. Judging is split into
+# compile and run queues, and these languages (by file extension) get their own
+# compile.<ext> and run.<ext> queues so their workers can be scaled separately.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+JUDGE_LANGUAGE_QUEUES = config('JUDGE_LANGUAGE_QUEUES', default='py,cpp,java', cast=Csv())
+# Bulk rejudges: every REJUDGE_INTERVAL seconds up to REJUDGE_BATCH_SIZE submissions join the
+# rejudge's low-weight fair-queue flow, while fewer than REJUDGE_MAX_IN_FLIGHT are waiting or judging
+REJUDGE_BATCH_SIZE = config('REJUDGE_BATCH_SIZE', default=20, cast=int)
+REJUDGE_INTERVAL = config('REJUDGE_INTERVAL', default=10.0, cast=float)  # seconds
+REJUDGE_MAX_IN_FLIGHT = config('REJUDGE_MAX_IN_FLIGHT', default=50, cast=int)
+
+# Sandbox Configuration
+# Executor backend: DockerExecutor, or LocalExecutor for hosts/CI without Docker
+JUDGE_EXECUTOR_BACKEND = config('JUDGE_EXECUTOR_BACKEND', default='apps.submissions.docker_executor.DockerExecutor')
+# Warm pool of pre-started containers per image, reused via `docker exec`
+SANDBOX_POOL_ENABLED = config('SANDBOX_POOL_ENABLED', default=True, cast=bool)
+SANDBOX_POOL_SIZE = config('SANDBOX_POOL_SIZE', default=4, cast=int)
+SANDBOX_POOL_IDLE_TIMEOUT = config('SANDBOX_POOL_IDLE_TIMEOUT', default=300, cast=int)  # seconds
+SANDBOX_POOL_HEALTHCHECK_INTERVAL = config('SANDBOX_POOL_HEALTHCHECK_INTERVAL', default=30, cast=int)  # seconds
+SANDBOX_POOL_ACQUIRE_TIMEOUT = config('SANDBOX_POOL_ACQUIRE_TIMEOUT', default=60, cast=int)  # seconds
+# Pools per worker process (one per image, memory limit and pinned core); idle ones are evicted LRU
+SANDBOX_POOL_MAX_POOLS = config('SANDBOX_POOL_MAX_POOLS', default=8, cast=int)
+SANDBOX_WORK_ROOT = config('SANDBOX_WORK_ROOT', default='/tmp/judge')
+# Pooled sessions run as a uid from this range that alone can enter the submission's work dir
+# (the worker must be able to chown, i.e. run as root; otherwise per-run containers are used)
+SANDBOX_UID_BASE = config('SANDBOX_UID_BASE', default=200000, cast=int)
+SANDBOX_UID_COUNT = config('SANDBOX_UID_COUNT', default=100000, cast=int)
+# Limits of the compile container
+SANDBOX_COMPILE_MEMORY_MB = config('SANDBOX_COMPILE_MEMORY_MB', default=1024, cast=int)
+SANDBOX_COMPILE_PIDS_LIMIT = config('SANDBOX_COMPILE_PIDS_LIMIT', default=128, cast=int)
+# Extra container memory on top of the problem limit for the harness and runtime
+SANDBOX_MEMORY_OVERHEAD_MB = config('SANDBOX_MEMORY_OVERHEAD_MB', default=64, cast=int)
+
+# LocalExecutor: namespaces and a private mount namespace via bubblewrap, a dedicated
+# sandbox uid, an optional delegated cgroup v2 root (RLIMIT_AS without one) and seccomp.
+# Seccomp needs the libseccomp Python bindings (e.g. python3-seccomp) on the host.
+LOCAL_SANDBOX_BWRAP = config('LOCAL_SANDBOX_BWRAP', default='bwrap')
+LOCAL_SANDBOX_RO_BINDS = config(
+    'LOCAL_SANDBOX_RO_BINDS',
+    default='/usr,/bin,/lib,/lib64,/etc/alternatives,/etc/ld.so.cache',
+    cast=Csv()
+)
+LOCAL_SANDBOX_UID = config('LOCAL_SANDBOX_UID', default=65534, cast=int)
+LOCAL_SANDBOX_CGROUP_ROOT = config('LOCAL_SANDBOX_CGROUP_ROOT', default='')
+LOCAL_SANDBOX_SECCOMP = config('LOCAL_SANDBOX_SECCOMP', default=True, cast=bool)
+
+# Content-addressed cache of compiled binaries, LRU-evicted above the size bound
+COMPILE_CACHE_DIR = config('COMPILE_CACHE_DIR', default='/tmp/judge-compile-cache')
+COMPILE_CACHE_MAX_SIZE = config('COMPILE_CACHE_MAX_SIZE', default=512 * 1024 * 1024, cast=int)  # bytes
+
+# Content-addressed test data: shared store (object-store stand-in) and a verified node-local cache
+TEST_DATA_STORE_DIR = config('TEST_DATA_STORE_DIR', default=str(BASE_DIR / 'media' / 'test-data'))
+TEST_DATA_CACHE_DIR = config('TEST_DATA_CACHE_DIR', default='/tmp/judge-test-data')
+TEST_DATA_CACHE_MAX_SIZE = config('TEST_DATA_CACHE_MAX_SIZE', default=2 * 1024 * 1024 * 1024, cast=int)  # bytes
+# Expected outputs are kept apart from inputs, readable only by the judge and checker programs
+TEST_OUTPUT_STORE_DIR = config('TEST_OUTPUT_STORE_DIR', default=str(BASE_DIR / 'media' / 'test-output'))
+TEST_OUTPUT_CACHE_DIR = config('TEST_OUTPUT_CACHE_DIR', default='/tmp/judge-test-output')
+
+# Judge Configuration
+# 'celery' judges each submission in an execute_code_task; 'async' leaves them PENDING
+# for `manage.py run_judge_worker`, which drives many sandboxes from one asyncio process
+JUDGE_WORKER = config('JUDGE_WORKER', default='celery')
+JUDGE_ASYNC_MAX_SUBMISSIONS = config('JUDGE_ASYNC_MAX_SUBMISSIONS', default=32, cast=int)
+JUDGE_ASYNC_POLL_INTERVAL = config('JUDGE_ASYNC_POLL_INTERVAL', default=0.5, cast=float)  # seconds
+# Sandbox memory the async worker may have committed at once, on top of JUDGE_CPU_BUDGET cores
+JUDGE_MEMORY_BUDGET_MB = config('JUDGE_MEMORY_BUDGET_MB', default=4096, cast=int)
+# Finished submissions are written back together, up to this many per transaction
+JUDGE_ASYNC_RESULT_BATCH = config('JUDGE_ASYNC_RESULT_BATCH', default=16, cast=int)
+JUDGE_ASYNC_FLUSH_INTERVAL = config('JUDGE_ASYNC_FLUSH_INTERVAL', default=0.2, cast=float)  # seconds
+# Fair-share dispatch (see apps/submissions/fair_queue.py): submissions judged at once, about the
+# total concurrency of the judge workers, and judge work (test cases) per user per round
+JUDGE_FAIR_SHARE = config('JUDGE_FAIR_SHARE', default=True, cast=bool)
+JUDGE_FAIR_SLOTS = config('JUDGE_FAIR_SLOTS', default=16, cast=int)
+JUDGE_FAIR_QUANTUM = config('JUDGE_FAIR_QUANTUM', default=50, cast=int)
+# Share of a user's quantum that a bulk rejudge gets per round
+JUDGE_FAIR_REJUDGE_WEIGHT = config('JUDGE_FAIR_REJUDGE_WEIGHT', default=0.1, cast=float)
+JUDGE_FAIR_SLOT_TIMEOUT = config('JUDGE_FAIR_SLOT_TIMEOUT', default=15 * 60, cast=int)  # seconds
+# Submission token buckets (see apps/submissions/rate_limit.py): per user, and per user and problem
+SUBMIT_USER_BURST = config('SUBMIT_USER_BURST', default=10, cast=int)
+SUBMIT_USER_PER_MINUTE = config('SUBMIT_USER_PER_MINUTE', default=6, cast=float)
+SUBMIT_PROBLEM_BURST = config('SUBMIT_PROBLEM_BURST', default=5, cast=int)
+SUBMIT_PROBLEM_PER_MINUTE = config('SUBMIT_PROBLEM_PER_MINUTE', default=3, cast=float)
+# Identical code resubmitted within this window returns the earlier submission
+SUBMIT_DUPLICATE_WINDOW = config('SUBMIT_DUPLICATE_WINDOW', default=30, cast=int)  # seconds
+# Identical code for an unchanged test set reuses the earlier verdict for this long
+VERDICT_MEMO_TIMEOUT = config('VERDICT_MEMO_TIMEOUT', default=7 * 24 * 3600, cast=int)  # seconds
+# Run all test cases of a submission in one sandbox session via the in-sandbox harness
+JUDGE_BATCH_MODE = config('JUDGE_BATCH_MODE', default=True, cast=bool)
+# Time limits apply to CPU time; wall clock is capped at this multiple to catch blocked programs.
+# Must stay above 1 / sandbox --cpus quota (0.5), or CPU-bound runs hit the wall limit first.
+JUDGE_WALL_TIME_MULTIPLIER = config('JUDGE_WALL_TIME_MULTIPLIER', default=3.0, cast=float)
+# Test cases of one submission run concurrently, each pinned to a core from the node budget
+JUDGE_MAX_PARALLEL_TESTS = config('JUDGE_MAX_PARALLEL_TESTS', default=4, cast=int)
+JUDGE_CPU_BUDGET = config('JUDGE_CPU_BUDGET', default=os.cpu_count() or 1, cast=int)
+JUDGE_CPU_LOCK_DIR = config('JUDGE_CPU_LOCK_DIR', default='/tmp/judge-cpus')
+# Program stdout above this is cut off and judged OUTPUT_LIMIT_EXCEEDED.
+# Must stay below the pooled sandbox /tmp tmpfs (64m), where the harness spools it.
+JUDGE_OUTPUT_LIMIT = config('JUDGE_OUTPUT_LIMIT', default=16 * 1024 * 1024, cast=int)  # bytes
+# Only this much output, around the first mismatch, is stored on a test result
+JUDGE_OUTPUT_EXCERPT_SIZE = config('JUDGE_OUTPUT_EXCERPT_SIZE', default=1024, cast=int)  # bytes
+# Cap on the output and error message stored for each failing test case
+JUDGE_STORED_DETAIL_SIZE = config('JUDGE_STORED_DETAIL_SIZE', default=4096, cast=int)  # characters
+# CPU time a problem's checker program gets per test case it checks
+JUDGE_CHECKER_TIME_LIMIT = config('JUDGE_CHECKER_TIME_LIMIT', default=2.0, cast=float)  # seconds
+# Interactive runs: results are only kept in the cache, for this long
+JUDGE_RUN_RESULT_TIMEOUT = config('JUDGE_RUN_RESULT_TIMEOUT', default=300, cast=int)  # seconds
+JUDGE_RUN_INPUT_LIMIT = config('JUDGE_RUN_INPUT_LIMIT', default=1024 * 1024, cast=int)  # bytes
+JUDGE_RUN_OUTPUT_LIMIT = config('JUDGE_RUN_OUTPUT_LIMIT', default=64 * 1024, cast=int)  # bytes shown
+# Bearer token Prometheus scrapes /metrics with; without one, /metrics only exists in DEBUG
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
 
 # Cache Configuration
 CACHES = {
@@ -8,6 +8,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
+from apps.submissions.views import judge_metrics
+
 from django.http import JsonResponse
 from django.urls import path, include
 
@@ -39,6 +41,9 @@ urlpatterns = [
     
     # Health check endpoint
     path('health/', include('health_check.urls')),
+
+    # Prometheus scrape endpoint for judge metrics
+    path('metrics', judge_metrics),
     
     # Redirect root to API documentation or frontend
     path('', RedirectView.as_view(url='/api/', permanent=False)),
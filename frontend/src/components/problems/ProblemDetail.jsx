@@ -4,6 +4,10 @@ import { useParams } from 'react-router-dom'
 import { CodeEditor } from '../editor/CodeEditor'
 import { Button } from '../common/UI/Button'
 
+// Runs take seconds; stop polling after a minute instead of spinning forever
+const RUN_POLL_INTERVAL_MS = 500
+const RUN_POLL_ATTEMPTS = 120
+
 export const ProblemDetail = () => {
   const { id: problemId } = useParams()
   const [problem, setProblem] = useState(null)
@@ -13,6 +17,10 @@ export const ProblemDetail = () => {
   const [loading, setLoading] = useState(false)
   const [submissionResult, setSubmissionResult] = useState(null)
   const [submitError, setSubmitError] = useState(null)
+  const [customInput, setCustomInput] = useState('')
+  const [useCustomInput, setUseCustomInput] = useState(false)
+  const [running, setRunning] = useState(false)
+  const [runResult, setRunResult] = useState(null)
 
   // Fetch problem
   useEffect(() => {
@@ -97,6 +105,45 @@ export const ProblemDetail = () => {
     }
   }
 
+  // Runs are not submissions: nothing is stored, results expire after a few minutes
+  const handleRun = async () => {
+    if (!problem || !languageId || !code.trim()) {
+      setSubmitError('Please ensure code, problem, and language are all set.')
+      return
+    }
+
+    setRunning(true)
+    setSubmitError(null)
+    setRunResult(null)
+
+    try {
+      const payload = {
+        code,
+        language: languageId,
+        problem: problem.id,
+      }
+      if (useCustomInput) {
+        payload.input = customInput
+      }
+
+      let result = await post('/submissions/run/', payload)
+      for (let attempt = 0; result.status === 'PENDING'; attempt++) {
+        if (attempt >= RUN_POLL_ATTEMPTS) {
+          throw new Error('Run timed out.')
+        }
+        await new Promise((resolve) => setTimeout(resolve, RUN_POLL_INTERVAL_MS))
+        result = await get(`/submissions/run/${result.id}/`)
+      }
+      setRunResult(result)
+    } catch (err) {
+      const details = err.response?.data
+      console.error('[handleRun] Run error:', err)
+      setSubmitError(details?.error || err.message || 'Run failed.')
+    } finally {
+      setRunning(false)
+    }
+  }
+
   if (!problem) return <div className="p-4 text-gray-600">Loading problem...</div>
 
   return (
@@ -151,12 +198,55 @@ export const ProblemDetail = () => {
             }
           />
 
-          <Button onClick={handleSubmit} disabled={loading} className="mt-4 w-full">
-            {loading ? 'Submitting...' : 'Submit Code'}
-          </Button>
+          <label className="flex items-center gap-2 mt-4 text-sm">
+            <input
+              type="checkbox"
+              checked={useCustomInput}
+              onChange={(e) => setUseCustomInput(e.target.checked)}
+            />
+            Run with custom input
+          </label>
+          {useCustomInput && (
+            <textarea
+              value={customInput}
+              onChange={(e) => setCustomInput(e.target.value)}
+              rows={4}
+              className="border px-2 py-1 rounded w-full mt-2 font-mono text-sm"
+              placeholder="stdin"
+            />
+          )}
+
+          <div className="flex gap-2 mt-4">
+            <Button onClick={handleRun} disabled={running || loading} className="flex-1">
+              {running ? 'Running...' : 'Run'}
+            </Button>
+            <Button onClick={handleSubmit} disabled={loading} className="flex-1">
+              {loading ? 'Submitting...' : 'Submit Code'}
+            </Button>
+          </div>
 
           {submitError && <div className="text-red-600 mt-2">{submitError}</div>}
 
+          {runResult && (
+            <div className="bg-gray-50 p-4 mt-6 rounded space-y-2">
+              <h4 className="font-semibold mb-2">
+                Run: <span className="text-blue-600">{runResult.verdict || runResult.status}</span>
+              </h4>
+              {runResult.error && <p className="text-red-500 text-sm">{runResult.error}</p>}
+              {runResult.results.map((test, idx) => (
+                <div key={idx} className="border-t pt-2 text-sm">
+                  <p><strong>{test.test_case ? `Sample ${idx + 1}` : 'Custom input'}</strong></p>
+                  <p>Status: <span className="font-mono">{test.status}</span></p>
+                  <pre className="bg-white p-2 rounded whitespace-pre-wrap">{test.output}</pre>
+                  {test.error_message && (
+                    <p className="text-red-500">Error: <code>{test.error_message}</code></p>
+                  )}
+                  <p>Time: {test.execution_time} ms</p>
+                </div>
+              ))}
+            </div>
+          )}
+
           {submissionResult && (
             <div className="bg-gray-100 p-4 mt-6 rounded space-y-2">
               <h4 className="font-semibold mb-2">
@@ -10,8 +10,11 @@ export const SUBMISSION_STATUS = {
   WRONG_ANSWER: 'Wrong Answer',
   TIME_LIMIT_EXCEEDED: 'Time Limit Exceeded',
   MEMORY_LIMIT_EXCEEDED: 'Memory Limit Exceeded',
+  OUTPUT_LIMIT_EXCEEDED: 'Output Limit Exceeded',
   COMPILATION_ERROR: 'Compilation Error',
-  RUNTIME_ERROR: 'Runtime Error'
+  RUNTIME_ERROR: 'Runtime Error',
+  JUDGE_ERROR: 'Judge Error',
+  SKIPPED: 'Skipped'
 }
 
 